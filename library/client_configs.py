@@ -0,0 +1,479 @@
+#!/usr/bin/python
+
+# client_configs.py - Ansible module to render every client configuration file for a whole
+# user list in a single invocation.
+#
+# Why: one template task per user per format re-resolves variables and re-compiles the
+# template for every file, which dominates update-users once key generation is batched.
+
+import ast
+import base64
+import fcntl
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from ansible.module_utils.basic import AnsibleModule
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, TemplateError
+
+try:
+    import segno
+
+    HAS_SEGNO = True
+except ImportError:
+    HAS_SEGNO = False
+
+"""
+Ansible module to render client configuration templates in bulk.
+
+Templates are loaded once into a shared Jinja2 environment configured like
+Ansible's template module (trim_blocks, trailing newlines of the template
+preserved but not those of includes, "#jinja2:" override headers), plus the
+three Ansible filters the client templates use: to_uuid, random and
+b64decode. Modules run from a payload that only carries module_utils, so
+these follow Ansible's filter plugins rather than import them. Lookups are not
+available: everything else a template needs is passed in as data, so the
+templates render the same with Ansible's template module given the same
+variables.
+
+Every template is rendered for every user, with these variables on top of
+vars: item (the user name), the template's own vars, the user's values of
+user_vars, and user_files. user_vars map a variable name to a mapping of user
+to value, for per-user data such as addresses and ports. user_files name
+files read per user, such as keys and p12 bundles, with {user} in the path;
+their content is passed stripped of trailing whitespace like lookup('file'),
+or base64-encoded and wrapped like the output of base64(1).
+
+A file is only written when its content or mode differs from what is on disk.
+Users are processed in a process pool sized to the CPU count.
+
+Templates with a qr destination also get a PNG QR code of the rendered file,
+generated in-process with segno. The PNG is written before the file it
+encodes, so it is only regenerated when that file changed or the PNG is
+missing. QR codes are skipped with a warning when segno is not installed.
+
+With a manifest, the module keeps make-style dependency records per user in
+a JSON file shared by all client_configs tasks of a server, one section per
+task: a fingerprint of the template sources, templates, vars and the user's
+values of user_vars, the content hashes of the user_files (keys,
+certificates, p12 bundles), and the content hashes and modes of the outputs.
+Users whose record still matches are not rendered at all, so a run where
+nothing changed only hashes files, and adding a user only renders that user. Variables that change on every run, such as generated passwords, can
+be left out of the fingerprint with untracked_vars when a dependency file
+changes along with them (the p12 bundle that a password opens).
+
+Parameters:
+- template_dirs: Directories templates and includes are loaded from
+- templates: List of templates, each with src, dest (containing {user}), and optional mode, vars and qr
+- users: List of all users
+- render: Users to render, defaults to all users
+- vars: Variables shared by all templates
+- user_vars: Mapping of variable name to a mapping of user to the value for that user
+- user_files: List of files read per user, each with name, path (containing {user}) and optional base64
+- workers: Number of worker processes, 0 for the CPU count
+- manifest: Optional manifest file with the dependency records
+- manifest_section: Section of the manifest owned by this task, required with manifest
+- untracked_vars: Names of vars left out of the manifest fingerprint
+
+Returns:
+- changed: Whether any file was created or modified
+- changed_files: Paths of the files that were created or modified
+- rendered: Number of files rendered
+- up_to_date: Users that were skipped because their manifest record matched
+"""
+
+JINJA2_OVERRIDE = "#jinja2:"
+UUID_NAMESPACE_ANSIBLE = uuid.UUID("361E6D51-FAEC-444A-9079-341386DA8E2E")
+
+# Populated once per worker process by init_worker
+_ctx = {}
+
+
+def to_uuid(value, namespace=UUID_NAMESPACE_ANSIBLE):
+    """Ansible's to_uuid filter."""
+    return str(uuid.uuid5(uuid.UUID(str(namespace)), str(value)))
+
+
+def rand(end, start=None, step=None, seed=None):
+    """Ansible's random filter; a seed makes the result reproducible."""
+    r = random.SystemRandom() if seed is None else random.Random(seed)
+    if isinstance(end, int):
+        return r.randrange(start or 0, end, step or 1)
+    return r.choice(list(end))
+
+
+def b64decode(value):
+    """Ansible's b64decode filter."""
+    return base64.b64decode(str(value)).decode()
+
+
+def create_environment(template_dirs):
+    """Create the Jinja2 environment shared by all templates."""
+    env = Environment(
+        loader=FileSystemLoader(template_dirs),
+        undefined=StrictUndefined,
+        trim_blocks=True,
+    )
+    env.filters.update({"to_uuid": to_uuid, "random": rand, "b64decode": b64decode})
+    return env
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def count_trailing_newlines(text):
+    return len(text) - len(text.rstrip("\n"))
+
+
+def load_template(env, name):
+    """
+    Compile a template, applying a "#jinja2:" override header like Ansible does.
+
+    Returns a tuple of (template, number of trailing newlines of the source).
+    """
+    source = env.loader.get_source(env, name)[0]
+    if source.startswith(JINJA2_OVERRIDE):
+        header, _, source = source.partition("\n")
+        overrides = {}
+        for pair in header[len(JINJA2_OVERRIDE) :].split(","):
+            key, _, value = pair.partition(":")
+            overrides[key.strip()] = ast.literal_eval(value.strip())
+        env = env.overlay(**overrides)
+    return env.from_string(source), count_trailing_newlines(source)
+
+
+def render(loaded, context):
+    """Render a loaded template, restoring the trailing newlines Jinja2 strips."""
+    template, newlines = loaded
+    data = template.render(context)
+    return data + "\n" * max(0, newlines - count_trailing_newlines(data))
+
+
+def init_worker(params):
+    """Load the templates once per process."""
+    env = create_environment(params["template_dirs"])
+    _ctx.clear()
+    _ctx.update(params)
+    _ctx["compiled"] = {t["src"]: load_template(env, t["src"]) for t in params["templates"]}
+    _ctx.setdefault("sources", None)
+
+
+def read_file(path):
+    """Return the content of a file, or None if it does not exist."""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def write_file(path, data, mode):
+    """Atomically write data to path with the given permissions."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_if_changed(path, data, mode, check_mode):
+    """Atomically write data to path unless it already has this content and mode."""
+    same_content = read_file(path) == data
+    same_mode = same_content and (os.stat(path).st_mode & 0o7777) == mode
+
+    if same_mode:
+        return False
+    if check_mode:
+        return True
+    if same_content:
+        os.chmod(path, mode)
+    else:
+        write_file(path, data, mode)
+    return True
+
+
+def qr_code(data):
+    """Encode data as a PNG QR code, like `segno --scale=5 --output=<file>.png`."""
+    buffer = io.BytesIO()
+    segno.make(data).save(buffer, kind="png", scale=5)
+    return buffer.getvalue()
+
+
+def read_user_files(user):
+    """
+    Read the user_files of one user, recording their hashes for the manifest.
+
+    Returns a tuple of (variables, mapping of path to content hash).
+    """
+    variables = {}
+    deps = {}
+    for user_file in _ctx.get("user_files", []):
+        path = user_file["path"].replace("{user}", user)
+        with open(path, "rb") as f:
+            data = f.read()
+        deps[path] = digest(data)
+        if user_file.get("base64"):
+            variables[user_file["name"]] = base64.encodebytes(data).decode().rstrip("\n")
+        else:
+            variables[user_file["name"]] = data.decode().rstrip()
+    return variables, deps
+
+
+def render_user(user):
+    """
+    Render every template for one user.
+
+    Returns a tuple of (paths that changed, manifest record of the user).
+    """
+    changed = []
+    outputs = {}
+    files, deps = read_user_files(user)
+    for template in _ctx["templates"]:
+        context = dict(_ctx["vars"])
+        context.update(template.get("vars") or {})
+        context["item"] = user
+        context.update({name: values[user] for name, values in _ctx["user_vars"].items() if user in values})
+        context.update(files)
+
+        data = render(_ctx["compiled"][template["src"]], context).encode()
+        dest = template["dest"].replace("{user}", user)
+        mode = int(str(template.get("mode") or "0600"), 8)
+
+        if template.get("qr") and HAS_SEGNO:
+            qr_path = template["qr"].replace("{user}", user)
+            if read_file(dest) != data or not os.path.exists(qr_path):
+                png = qr_code(data.decode())
+                if not _ctx["check_mode"]:
+                    write_file(qr_path, png, mode)
+                changed.append(qr_path)
+            else:
+                png = read_file(qr_path)
+            outputs[qr_path] = [digest(png), mode]
+
+        if write_if_changed(dest, data, mode, _ctx["check_mode"]):
+            changed.append(dest)
+        outputs[dest] = [digest(data), mode]
+
+    record = {"fingerprint": fingerprint(user), "deps": deps, "outputs": outputs}
+    return changed, record
+
+
+def worker_count(requested, jobs):
+    """Size the process pool from the CPU count and the amount of work."""
+    workers = requested or os.cpu_count() or 1
+    return max(1, min(workers, jobs))
+
+
+def sources_digest(template_dirs):
+    """Hash every file below the template directories, including includes."""
+    sha = hashlib.sha256()
+    for template_dir in template_dirs:
+        for root, dirs, files in os.walk(template_dir):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                sha.update(os.path.relpath(path, template_dir).encode() + b"\0" + read_file(path) + b"\0")
+    return sha.hexdigest()
+
+
+def fingerprint(user):
+    """
+    Hash everything a user's outputs depend on except the files read while rendering.
+
+    Only the user's own values of user_vars are included, so adding or removing
+    another user does not change the fingerprint.
+    """
+    inputs = [
+        _ctx["sources"],
+        _ctx["templates"],
+        {name: value for name, value in _ctx["vars"].items() if name not in _ctx.get("untracked_vars", [])},
+        {name: values.get(user) for name, values in _ctx["user_vars"].items()},
+        _ctx.get("user_files", []),
+        user,
+        HAS_SEGNO,
+    ]
+    return digest(json.dumps(inputs, sort_keys=True, default=str).encode())
+
+
+def up_to_date(record, user):
+    """Check whether a manifest record still matches the inputs and the outputs on disk."""
+    if not record or record.get("fingerprint") != fingerprint(user):
+        return False
+    for path, expected in record["deps"].items():
+        data = read_file(path)
+        if data is None or digest(data) != expected:
+            return False
+    for path, (expected, mode) in record["outputs"].items():
+        data = read_file(path)
+        if data is None or digest(data) != expected or (os.stat(path).st_mode & 0o7777) != mode:
+            return False
+    return True
+
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def update_manifest(path, section, records, users):
+    """Merge the records of one section into the manifest, dropping users that no longer exist."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # Client config tasks of different roles can run concurrently
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = load_manifest(path)
+        entries = manifest.get(section, {})
+        entries.update(records)
+        manifest[section] = {user: entries[user] for user in users if user in entries}
+        write_file(path, json.dumps(manifest, indent=1, sort_keys=True).encode() + b"\n", 0o600)
+
+
+def render_configs(params, render=None):
+    """
+    Render all templates for the users to render, in parallel when more than one worker is useful.
+
+    Returns a result dict suitable for module.exit_json.
+    """
+    users = list(dict.fromkeys(params["users"] if render is None else render))
+
+    manifest = params.get("manifest")
+    up_to_date_users = []
+    if manifest:
+        init_worker(params)
+        _ctx["sources"] = params["sources"] = sources_digest(params["template_dirs"])
+        section = load_manifest(manifest).get(params["manifest_section"], {})
+        up_to_date_users = [user for user in users if up_to_date(section.get(user), user)]
+        users = [user for user in users if user not in up_to_date_users]
+
+    workers = worker_count(params["workers"], len(users))
+    # Forked workers inherit the loaded module; spawn would need to re-import it.
+    if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=init_worker,
+            initargs=(params,),
+        ) as pool:
+            outcomes = list(pool.map(render_user, users))
+    else:
+        init_worker(params)
+        outcomes = [render_user(user) for user in users]
+
+    changed_files = [path for paths, _ in outcomes for path in paths]
+    if manifest and not params["check_mode"]:
+        records = {user: record for user, (_, record) in zip(users, outcomes)}
+        update_manifest(manifest, params["manifest_section"], records, params["users"])
+
+    return {
+        "changed": bool(changed_files),
+        "changed_files": changed_files,
+        "rendered": len(users) * len(params["templates"]),
+        "up_to_date": up_to_date_users,
+    }
+
+
+def run_module():
+    """
+    Main execution function for the client_configs Ansible module.
+
+    Validates parameters and renders every template for the requested users.
+    """
+    module_args = {
+        "template_dirs": {"type": "list", "elements": "path", "required": True},
+        "templates": {
+            "type": "list",
+            "elements": "dict",
+            "required": True,
+            "options": {
+                "src": {"type": "str", "required": True},
+                "dest": {"type": "str", "required": True},
+                "mode": {"type": "str", "default": "0600"},
+                "vars": {"type": "dict", "default": {}},
+                "qr": {"type": "str", "required": False},
+            },
+        },
+        "users": {"type": "list", "elements": "str", "required": True},
+        "render": {"type": "list", "elements": "str", "required": False},
+        "vars": {"type": "dict", "default": {}},
+        "user_vars": {"type": "dict", "default": {}},
+        "user_files": {
+            "type": "list",
+            "elements": "dict",
+            "default": [],
+            "options": {
+                "name": {"type": "str", "required": True},
+                "path": {"type": "path", "required": True},
+                "base64": {"type": "bool", "default": False},
+            },
+        },
+        "workers": {"type": "int", "default": 0},
+        "manifest": {"type": "path", "required": False},
+        "manifest_section": {"type": "str", "required": False},
+        "untracked_vars": {"type": "list", "elements": "str", "default": []},
+    }
+
+    module = AnsibleModule(
+        argument_spec=module_args,
+        required_together=[("manifest", "manifest_section")],
+        supports_check_mode=True,
+    )
+
+    users = [str(u) for u in module.params["users"]]
+    render = None if module.params["render"] is None else [str(u) for u in module.params["render"]]
+    invalid = [u for u in users if not u or "/" in u or u.startswith(".")]
+    if invalid:
+        module.fail_json(msg=f"Invalid user names for config file paths: {invalid}")
+    unknown = sorted(set(render or []) - set(users))
+    if unknown:
+        module.fail_json(msg=f"Users to render are not in users: {unknown}")
+    destinations = [path for t in module.params["templates"] for path in (t["dest"], t["qr"]) if path]
+    missing = [path for path in destinations if "{user}" not in path]
+    if missing:
+        module.fail_json(msg=f"Template destinations must contain {{user}}: {missing}")
+    missing = [f["path"] for f in module.params["user_files"] if "{user}" not in f["path"]]
+    if missing:
+        module.fail_json(msg=f"User file paths must contain {{user}}: {missing}")
+    not_mappings = [name for name, values in module.params["user_vars"].items() if not isinstance(values, dict)]
+    if not_mappings:
+        module.fail_json(msg=f"user_vars must map each user to a value: {not_mappings}")
+
+    if not HAS_SEGNO and any(t["qr"] for t in module.params["templates"]):
+        module.warn("segno is not installed, QR codes are not generated")
+
+    params = {key: module.params[key] for key in module_args if key not in ("users", "render")}
+    params["users"] = users
+    params["check_mode"] = module.check_mode
+
+    try:
+        result = render_configs(params, render)
+    except (OSError, ValueError, TemplateError) as e:
+        module.fail_json(msg=f"Failed to render client configs: {e}")
+
+    module.exit_json(**result)
+
+
+def main():
+    """Entry point when module is executed directly."""
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+#!/usr/bin/python
+
+# region_catalog.py - Ansible module to look up the regions of a cloud provider through a local
+# cache.
+#
+# Why: every deploy queried the region list of the provider before the first prompt, one API
+# call after the other, although the list hardly ever changes.
+
+import json
+import os
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from ansible.module_utils.basic import AnsibleModule
+
+"""
+Ansible module to return the region catalog of a cloud provider.
+
+The catalog is read from <cache_path>/regions-<provider>.json, or
+regions-<provider>-<scope>.json when the regions depend on the account, as
+long as it is younger than ttl seconds. Otherwise it is fetched from the
+provider API and written back to the cache. A ttl of 0 always fetches.
+
+The catalog holds the raw region objects of the provider API (and the zones
+for GCE), so the prompts can keep using the fields they already use.
+
+Parameters:
+- provider: digitalocean, gce, lightsail, linode or vultr
+- credentials: Provider credentials (see FETCHERS for the keys of each provider)
+- scope: Part of the cache file name, e.g. the GCE project
+- cache_path: Directory of the cache files
+- ttl: Maximum age of a cached catalog in seconds
+- refresh: Fetch the catalog even if the cache is fresh
+
+Returns:
+- changed: Whether the cache file was written
+- regions: Region objects of the provider API
+- zones: Zone objects (GCE only)
+- cached: Whether the catalog came from the cache
+- status: HTTP status of the provider API, 200 when the cache was used
+"""
+
+API_TIMEOUT = 30
+COMPUTE_SCOPE = "https://www.googleapis.com/auth/compute"
+
+
+class CatalogError(Exception):
+    """A provider API request failed. status is the HTTP status, or -1 if there was no response."""
+
+    def __init__(self, msg, status=-1):
+        super().__init__(msg)
+        self.status = status
+
+
+def get_json(url, token=None):
+    request = urllib.request.Request(url, headers={"Content-Type": "application/json"})
+    if token:
+        request.add_header("Authorization", "Bearer " + token)
+    try:
+        with urllib.request.urlopen(request, timeout=API_TIMEOUT) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        raise CatalogError(f"{url} returned HTTP {e.code}", e.code) from e
+    except urllib.error.URLError as e:
+        raise CatalogError(f"Failed to connect to {url}: {e.reason}") from e
+
+
+def fetch_digitalocean(credentials):
+    return {
+        "regions": get_json("https://api.digitalocean.com/v2/regions?per_page=200", credentials["token"])["regions"]
+    }
+
+
+def fetch_vultr(credentials):
+    return {"regions": get_json("https://api.vultr.com/v2/regions?per_page=500", credentials["api_key"])["regions"]}
+
+
+def fetch_linode(credentials):
+    return {"regions": get_json("https://api.linode.com/v4/regions?page_size=500", credentials.get("token"))["data"]}
+
+
+def fetch_lightsail(credentials):
+    import boto3
+
+    client = boto3.client(
+        "lightsail",
+        region_name="us-east-1",
+        aws_access_key_id=credentials["access_key"],
+        aws_secret_access_key=credentials["secret_key"],
+    )
+    return {"regions": client.get_regions(includeAvailabilityZones=False)["regions"]}
+
+
+def fetch_gce(credentials):
+    from google.auth.transport.requests import AuthorizedSession
+    from google.oauth2 import service_account
+
+    account = service_account.Credentials.from_service_account_file(
+        credentials["service_account_file"], scopes=[COMPUTE_SCOPE]
+    )
+    session = AuthorizedSession(account)
+    catalog = {}
+    for scope in ("regions", "zones"):
+        url = f"https://compute.googleapis.com/compute/v1/projects/{credentials['project']}/{scope}"
+        response = session.get(url, params={"filter": "status=UP"}, timeout=API_TIMEOUT)
+        if response.status_code != 200:
+            raise CatalogError(f"{url} returned HTTP {response.status_code}", response.status_code)
+        catalog[scope] = response.json().get("items", [])
+    return catalog
+
+
+FETCHERS = {
+    "digitalocean": fetch_digitalocean,  # token
+    "gce": fetch_gce,  # service_account_file, project
+    "lightsail": fetch_lightsail,  # access_key, secret_key
+    "linode": fetch_linode,  # token (optional)
+    "vultr": fetch_vultr,  # api_key
+}
+
+
+def cache_file(cache_path, provider, scope=None):
+    name = f"regions-{provider}-{scope}.json" if scope else f"regions-{provider}.json"
+    return os.path.join(cache_path, name)
+
+
+def read_cache(path, ttl, now):
+    """Return the cached catalog, or None if it is missing, unreadable or older than ttl."""
+    try:
+        with open(path) as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(catalog, dict) or not 0 <= now - catalog.get("fetched_at", 0) < ttl:
+        return None
+    return catalog
+
+
+def write_cache(path, catalog):
+    """Atomically write the catalog to path."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(catalog, f, indent=1, default=str)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def lookup(provider, credentials, cache_path, ttl=86400, scope=None, refresh=False, check_mode=False):
+    """
+    Return the region catalog of a provider, from the cache when it is fresh.
+
+    Returns a result dict suitable for module.exit_json. Raises CatalogError
+    when the provider API fails.
+    """
+    now = time.time()
+    path = cache_file(cache_path, provider, scope)
+    catalog = None if refresh or ttl <= 0 else read_cache(path, ttl, now)
+    result = {"changed": False, "cached": catalog is not None, "status": 200}
+    if catalog is None:
+        catalog = FETCHERS[provider](credentials)
+        catalog["fetched_at"] = int(now)
+        if ttl > 0 and not check_mode:
+            write_cache(path, catalog)
+            result["changed"] = True
+    result["regions"] = catalog["regions"]
+    if "zones" in catalog:
+        result["zones"] = catalog["zones"]
+    return result
+
+
+def refresh_all(cache_path, credentials, scopes=None, max_workers=8):
+    """
+    Fetch the catalogs of several providers concurrently and write them to the cache.
+
+    credentials maps provider names to their credentials. Returns a mapping of
+    provider name to the number of regions, or to the exception that
+    prevented the refresh.
+    """
+    scopes = scopes or {}
+
+    def refresh(provider):
+        try:
+            result = lookup(provider, credentials[provider], cache_path, scope=scopes.get(provider), refresh=True)
+        except Exception as e:  # Report each provider, a failing one must not hide the others
+            return e
+        return len(result["regions"])
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(credentials)))) as executor:
+        return dict(zip(credentials, executor.map(refresh, credentials), strict=True))
+
+
+def run_module():
+    """
+    Main execution function for the region_catalog Ansible module.
+
+    Validates parameters and returns the regions of the provider.
+    """
+    module_args = {
+        "provider": {"type": "str", "required": True, "choices": sorted(FETCHERS)},
+        "credentials": {"type": "dict", "default": {}, "no_log": True},
+        "scope": {"type": "str"},
+        "cache_path": {"type": "path", "required": True},
+        "ttl": {"type": "int", "default": 86400},
+        "refresh": {"type": "bool", "default": False},
+    }
+
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+
+    try:
+        result = lookup(
+            module.params["provider"],
+            module.params["credentials"],
+            module.params["cache_path"],
+            ttl=module.params["ttl"],
+            scope=module.params["scope"],
+            refresh=module.params["refresh"],
+            check_mode=module.check_mode,
+        )
+    except CatalogError as e:
+        module.fail_json(msg=f"Failed to get the {module.params['provider']} regions: {e}", status=e.status)
+    except ImportError as e:
+        module.fail_json(msg=f"Python module {e.name} is missing, please install it")
+    except Exception as e:  # boto3 and google-auth raise their own exception types
+        module.fail_json(msg=f"Failed to get the {module.params['provider']} regions: {e}")
+
+    module.exit_json(**result)
+
+
+def main():
+    """Entry point when module is executed directly."""
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
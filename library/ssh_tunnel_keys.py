@@ -0,0 +1,193 @@
+#!/usr/bin/python
+
+# ssh_tunnel_keys.py - Ansible module to generate the SSH tunnel key pairs for a whole user
+# list in a single invocation.
+#
+# Why: a stat, openssl_privatekey and openssl_publickey task per user costs three module
+# round-trips per user, and 4096-bit RSA key generation is CPU-bound.
+
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from ansible.module_utils.basic import AnsibleModule
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+"""
+Ansible module to generate SSH tunnel keys in bulk.
+
+For every user the following files are maintained below path, using the
+same layout as the per-user community.crypto tasks this module replaces:
+
+- <user>.pem: passphrase-protected RSA private key in PEM format (0600)
+- <user>.pub: OpenSSH public key derived from the private key (0644)
+
+Existing key pairs are never regenerated or decrypted, since the passphrase
+is usually random per run; their public key is read from the .pub file.
+Users are processed in a process pool sized to the CPU count.
+
+Parameters:
+- path: SSH tunnel config directory (ssh_tunnels_config_path)
+- users: List of user names
+- passphrase: Passphrase of the private keys
+- key_size: RSA key size in bits
+- workers: Number of worker processes, 0 for the CPU count
+
+Returns:
+- changed: Whether any file was created or modified
+- created: Users whose private key was newly generated
+- public_keys: Mapping of user name to OpenSSH public key
+"""
+
+# Populated once per worker process by init_worker
+_ctx = {}
+
+
+def read_file(path):
+    """Return the content of a file as bytes, or None if it does not exist."""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def write_file(path, data, mode):
+    """Atomically write data to path with the given permissions."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def init_worker(params):
+    _ctx.clear()
+    _ctx.update(params)
+
+
+def key_user(user):
+    """
+    Ensure the key pair of one user exists.
+
+    Returns a tuple of (user, public key, created, changed).
+    """
+    path = _ctx["path"]
+    check_mode = _ctx["check_mode"]
+    passphrase = _ctx["passphrase"].encode()
+    key_path = os.path.join(path, user + ".pem")
+    pub_path = os.path.join(path, user + ".pub")
+
+    if os.path.exists(key_path):
+        # The passphrase (p12_export_password) changes on every run unless it is
+        # pinned, so existing keys are never decrypted: their public key is read
+        # from the .pub file written when they were created.
+        public_key = read_file(pub_path)
+        if public_key is None:
+            raise ValueError(f"{pub_path} is missing, remove {key_path} to generate a new key pair")
+        return user, public_key.decode().strip(), False, False
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=_ctx["key_size"])
+    public_key = key.public_key().public_bytes(serialization.Encoding.OpenSSH, serialization.PublicFormat.OpenSSH)
+    if not check_mode:
+        pem = key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.TraditionalOpenSSL,
+            encryption_algorithm=serialization.BestAvailableEncryption(passphrase),
+        )
+        write_file(key_path, pem, 0o600)
+        write_file(pub_path, public_key, 0o644)
+    return user, public_key.decode(), True, True
+
+
+def worker_count(requested, jobs):
+    """Size the process pool from the CPU count and the amount of work."""
+    workers = requested or os.cpu_count() or 1
+    return max(1, min(workers, jobs))
+
+
+def generate_keys(params, users):
+    """
+    Generate the key pairs of all users, in parallel when more than one worker is useful.
+
+    Returns a result dict suitable for module.exit_json.
+    """
+    result = {"changed": False, "created": [], "public_keys": {}}
+    users = list(dict.fromkeys(users))
+
+    if not os.path.isdir(params["path"]):
+        if not params["check_mode"]:
+            os.makedirs(params["path"], mode=0o700, exist_ok=True)
+        result["changed"] = True
+
+    workers = worker_count(params["workers"], len(users))
+    # Forked workers inherit the loaded module; spawn would need to re-import it.
+    if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=init_worker,
+            initargs=(params,),
+        ) as pool:
+            outcomes = list(pool.map(key_user, users))
+    else:
+        init_worker(params)
+        outcomes = [key_user(user) for user in users]
+
+    for user, public_key, created, changed in outcomes:
+        result["public_keys"][user] = public_key
+        if created:
+            result["created"].append(user)
+        if changed:
+            result["changed"] = True
+
+    return result
+
+
+def run_module():
+    """
+    Main execution function for the ssh_tunnel_keys Ansible module.
+
+    Validates parameters, generates missing key pairs and reports the
+    public keys for all requested users.
+    """
+    module_args = {
+        "path": {"type": "path", "required": True},
+        "users": {"type": "list", "elements": "str", "required": True},
+        "passphrase": {"type": "str", "required": True, "no_log": True},
+        "key_size": {"type": "int", "default": 4096},
+        "workers": {"type": "int", "default": 0},
+    }
+
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+
+    users = [str(u) for u in module.params["users"]]
+    invalid = [u for u in users if not u or "/" in u or u.startswith(".")]
+    if invalid:
+        module.fail_json(msg=f"Invalid user names for key file paths: {invalid}")
+
+    params = {key: module.params[key] for key in module_args if key != "users"}
+    params["check_mode"] = module.check_mode
+
+    try:
+        result = generate_keys(params, users)
+    except (OSError, ValueError, TypeError) as e:
+        module.fail_json(msg=f"Failed to generate SSH tunnel keys: {e}")
+
+    module.exit_json(**result)
+
+
+def main():
+    """Entry point when module is executed directly."""
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/python
+
+# ssh_tunnel_users.py - Ansible module to reconcile the jailed SSH tunnel accounts with the
+# user list in a single invocation.
+#
+# Why: a user and authorized_key task per user, plus a user task per removed account, costs
+# two module round-trips per user on the server for every update-users run.
+
+import grp
+import os
+import pwd
+import tempfile
+
+from ansible.module_utils.basic import AnsibleModule
+
+"""
+Ansible module to reconcile SSH tunnel accounts on the server.
+
+Every user gets an account in group with home directory home_root/<user>,
+the given shell, and an authorized_keys file that contains exactly its
+public key. Members of group that are not in the user list are deleted
+together with their home directory. Accounts that are already in the
+desired state are not touched, so only new and removed users cost a
+useradd or userdel call.
+
+Parameters:
+- users: Mapping of user name to OpenSSH public key
+- group: Group of the tunnel accounts, which must exist
+- home_root: Directory the home directories are created in
+- shell: Login shell of the accounts
+
+Returns:
+- changed: Whether any account or authorized_keys file was modified
+- created: Users whose account was created
+- removed: Users whose account was deleted
+- updated: Existing users whose account or authorized_keys file was modified
+"""
+
+
+def group_members(group):
+    """Return the members of a group, including users with it as their primary group."""
+    entry = grp.getgrnam(group)
+    members = set(entry.gr_mem)
+    members.update(p.pw_name for p in pwd.getpwall() if p.pw_gid == entry.gr_gid)
+    return members
+
+
+def get_account(user):
+    """Return the passwd entry of a user, or None if it does not exist."""
+    try:
+        return pwd.getpwnam(user)
+    except KeyError:
+        return None
+
+
+def read_file(path):
+    """Return the content of a file as bytes, or None if it does not exist."""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def ensure_authorized_key(account, key, check_mode):
+    """
+    Make key the only entry of the user's authorized_keys file.
+
+    Returns True if the file or its directory was created or modified.
+    """
+    ssh_dir = os.path.join(account.pw_dir, ".ssh")
+    path = os.path.join(ssh_dir, "authorized_keys")
+    data = key.strip().encode() + b"\n"
+    owner = (account.pw_uid, account.pw_gid)
+
+    changed = read_file(path) != data
+    for target, mode in ((ssh_dir, 0o700), (path, 0o600)):
+        try:
+            st = os.lstat(target)
+        except FileNotFoundError:
+            changed = True
+            continue
+        if (st.st_mode & 0o7777) != mode or (st.st_uid, st.st_gid) != owner:
+            changed = True
+    if not changed or check_mode:
+        return changed
+
+    os.makedirs(ssh_dir, mode=0o700, exist_ok=True)
+    os.chown(ssh_dir, *owner)
+    os.chmod(ssh_dir, 0o700)
+    # Replace rather than rewrite in place: the directory is owned by the user
+    fd, tmp_path = tempfile.mkstemp(dir=ssh_dir, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            os.fchown(f.fileno(), *owner)
+            os.fchmod(f.fileno(), 0o600)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return True
+
+
+def reconcile_users(module, users, group, home_root, shell):
+    """
+    Create, update and delete accounts so the members of group match users.
+
+    Returns a result dict suitable for module.exit_json.
+    """
+    result = {"changed": False, "created": [], "removed": [], "updated": []}
+    gid = grp.getgrnam(group).gr_gid
+    members = group_members(group)
+    options = ["--gid", group, "--groups", group, "--shell", shell]
+
+    for user, key in users.items():
+        home = os.path.join(home_root, user)
+        account = get_account(user)
+        if account is None:
+            result["created"].append(user)
+            if module.check_mode:
+                continue
+            module.run_command(["useradd", *options, "--home-dir", home, "--create-home", user], check_rc=True)
+            ensure_authorized_key(get_account(user), key, False)
+            continue
+
+        updated = False
+        if account.pw_gid != gid or account.pw_dir != home or account.pw_shell != shell or user not in members:
+            updated = True
+            if not module.check_mode:
+                module.run_command(["usermod", *options, "--append", "--home", home, user], check_rc=True)
+                account = get_account(user)
+        if not os.path.isdir(account.pw_dir):
+            updated = True
+            if not module.check_mode:
+                os.makedirs(account.pw_dir, mode=0o750)
+                os.chown(account.pw_dir, account.pw_uid, account.pw_gid)
+        if os.path.isdir(account.pw_dir) and ensure_authorized_key(account, key, module.check_mode):
+            updated = True
+        if updated:
+            result["updated"].append(user)
+
+    for user in sorted(members - set(users)):
+        result["removed"].append(user)
+        if not module.check_mode:
+            module.run_command(["userdel", "--remove", "--force", user], check_rc=True)
+
+    result["changed"] = bool(result["created"] or result["removed"] or result["updated"])
+    return result
+
+
+def run_module():
+    """
+    Main execution function for the ssh_tunnel_users Ansible module.
+
+    Validates parameters and reconciles the tunnel accounts with the user list.
+    """
+    module_args = {
+        "users": {"type": "dict", "required": True},
+        "group": {"type": "str", "default": "algo"},
+        "home_root": {"type": "path", "default": "/var/jail"},
+        "shell": {"type": "str", "default": "/bin/false"},
+    }
+
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+
+    users = {str(user): str(key) for user, key in module.params["users"].items()}
+    invalid = [u for u in users if not u or "/" in u or u.startswith(".")]
+    if invalid:
+        module.fail_json(msg=f"Invalid user names for home directories: {invalid}")
+
+    try:
+        result = reconcile_users(
+            module, users, module.params["group"], module.params["home_root"], module.params["shell"]
+        )
+    except (OSError, KeyError) as e:
+        module.fail_json(msg=f"Failed to reconcile SSH tunnel users: {e}")
+
+    module.exit_json(**result)
+
+
+def main():
+    """Entry point when module is executed directly."""
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/python
+
+# strongswan_crl.py - Ansible module to maintain the strongSwan CRLs from a persistent
+# revocation index.
+#
+# Why: regenerating the CRL from scratch every run reads the certificate of every user ever
+# revoked and re-signs the CRL with a new timestamp, so it always changes and always has to be
+# pushed to the server.
+
+import datetime
+import json
+import os
+import tempfile
+
+from ansible.module_utils.basic import AnsibleModule
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+
+"""
+Ansible module to maintain a base CRL and a delta CRL for the strongSwan CA.
+
+The revocation index (revoked.json) records the serial number and the
+revocation date of every revoked user, so a user's certificate is read once,
+when it is revoked, and never again. The index also keeps the number of the
+last CRL and of the current base CRL.
+
+New revocations are published in a delta CRL (crl-delta.pem) that refers to
+the base CRL (crl.pem), which is left as it is. The base CRL is rebuilt with
+the complete list, and the delta CRL removed, when the delta would grow
+beyond delta_threshold entries, when a revoked user is added back, or when
+the base CRL is missing. With delta_threshold 0 every change rebuilds the
+base CRL. Nothing is signed when the revocations did not change.
+
+Parameters:
+- pki_path: strongSwan PKI directory (ipsec_pki_path)
+- revoke: Users whose certificates are revoked
+- ca_passphrase: Passphrase of private/cakey.pem
+- validity_days: Time until the nextUpdate of the CRLs
+- delta_threshold: Maximum number of entries of the delta CRL
+
+Returns:
+- changed: Whether a CRL was written
+- revoked: Users revoked in this run
+- restored: Users removed from the CRL because they were added back
+- full: Whether the base CRL was rebuilt
+- crls: File names of the CRLs to distribute, crl.pem and possibly crl-delta.pem
+"""
+
+INDEX = "revoked.json"
+BASE_CRL = "crl.pem"
+DELTA_CRL = "crl-delta.pem"
+
+
+def read_file(path):
+    """Return the content of a file as bytes, or None if it does not exist."""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def write_file(path, data, mode):
+    """Atomically write data to path with the given permissions."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def load_index(pki_path):
+    data = read_file(os.path.join(pki_path, INDEX))
+    if data is None:
+        return {"crl_number": 0, "base_crl_number": 0, "revoked": {}, "delta": []}
+    return json.loads(data)
+
+
+def published(pki_path):
+    """Return the names of the CRL files to distribute."""
+    return [name for name in (BASE_CRL, DELTA_CRL) if os.path.exists(os.path.join(pki_path, name))]
+
+
+def revoke_entry(pki_path, user, now):
+    """Read the serial number of a user's certificate. Returns None if there is no certificate."""
+    data = read_file(os.path.join(pki_path, "certs", user + ".crt"))
+    if data is None:
+        return None
+    serial = x509.load_pem_x509_certificate(data).serial_number
+    return {"serial": format(serial, "x"), "date": now.strftime("%Y%m%d%H%M%SZ")}
+
+
+def build_crl(ca_cert, ca_key, entries, crl_number, now, validity_days, base_crl_number=None):
+    """Sign a CRL listing entries. A base CRL number makes it a delta CRL."""
+    builder = (
+        x509.CertificateRevocationListBuilder()
+        .issuer_name(ca_cert.subject)
+        .last_update(now)
+        .next_update(now + datetime.timedelta(days=validity_days))
+        .add_extension(x509.CRLNumber(crl_number), critical=False)
+        .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_cert.public_key()), critical=False)
+    )
+    if base_crl_number is not None:
+        builder = builder.add_extension(x509.DeltaCRLIndicator(base_crl_number), critical=True)
+    for entry in entries:
+        date = datetime.datetime.strptime(entry["date"], "%Y%m%d%H%M%SZ").replace(tzinfo=datetime.timezone.utc)
+        builder = builder.add_revoked_certificate(
+            x509.RevokedCertificateBuilder().serial_number(int(entry["serial"], 16)).revocation_date(date).build()
+        )
+    return builder.sign(ca_key, hashes.SHA256()).public_bytes(serialization.Encoding.PEM)
+
+
+def update_crls(pki_path, revoke, ca_passphrase, validity_days=3650, delta_threshold=100, check_mode=False):
+    """
+    Update the revocation index and the CRLs.
+
+    Returns a result dict suitable for module.exit_json.
+    """
+    now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+    index = load_index(pki_path)
+    revoked = index["revoked"]
+    revoke = list(dict.fromkeys(revoke))
+
+    restored = [user for user in revoked if user not in revoke]
+    added = {}
+    for user in revoke:
+        if user not in revoked:
+            entry = revoke_entry(pki_path, user, now)
+            if entry:
+                added[user] = entry
+
+    base_path = os.path.join(pki_path, BASE_CRL)
+    delta_path = os.path.join(pki_path, DELTA_CRL)
+    delta = index["delta"] + list(added)
+    # CRLs written before the index existed have no CRL number a delta could refer to
+    full = (
+        bool(restored) or not index["base_crl_number"] or not os.path.exists(base_path) or len(delta) > delta_threshold
+    )
+    result = {"changed": False, "revoked": list(added), "restored": restored, "full": full}
+    if not (added or restored or full or (delta and not os.path.exists(delta_path))):
+        result["crls"] = published(pki_path)
+        return result
+
+    result["changed"] = True
+    if check_mode:
+        result["crls"] = [BASE_CRL] if full else [BASE_CRL, DELTA_CRL]
+        return result
+
+    for user in restored:
+        del revoked[user]
+    revoked.update(added)
+    index["crl_number"] += 1
+
+    ca_cert = x509.load_pem_x509_certificate(read_file(os.path.join(pki_path, "cacert.pem")))
+    ca_key = serialization.load_pem_private_key(
+        read_file(os.path.join(pki_path, "private", "cakey.pem")),
+        password=ca_passphrase.encode() if ca_passphrase else None,
+    )
+    if full:
+        crl = build_crl(ca_cert, ca_key, revoked.values(), index["crl_number"], now, validity_days)
+        write_file(base_path, crl, 0o644)
+        if os.path.exists(delta_path):
+            os.unlink(delta_path)
+        index["base_crl_number"] = index["crl_number"]
+        index["delta"] = []
+    else:
+        crl = build_crl(
+            ca_cert,
+            ca_key,
+            [revoked[user] for user in delta],
+            index["crl_number"],
+            now,
+            validity_days,
+            base_crl_number=index["base_crl_number"],
+        )
+        write_file(delta_path, crl, 0o644)
+        index["delta"] = delta
+
+    write_file(os.path.join(pki_path, INDEX), json.dumps(index, indent=1).encode() + b"\n", 0o600)
+    result["crls"] = published(pki_path)
+    return result
+
+
+def run_module():
+    """
+    Main execution function for the strongswan_crl Ansible module.
+
+    Validates parameters and updates the CRLs for the revoked users.
+    """
+    module_args = {
+        "pki_path": {"type": "path", "required": True},
+        "revoke": {"type": "list", "elements": "str", "required": True},
+        "ca_passphrase": {"type": "str", "required": True, "no_log": True},
+        "validity_days": {"type": "int", "default": 3650},
+        "delta_threshold": {"type": "int", "default": 100},
+    }
+
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+
+    revoke = [str(u) for u in module.params["revoke"]]
+    invalid = [u for u in revoke if not u or "/" in u or u.startswith(".")]
+    if invalid:
+        module.fail_json(msg=f"Invalid user names for certificate file paths: {invalid}")
+
+    try:
+        result = update_crls(
+            module.params["pki_path"],
+            revoke,
+            module.params["ca_passphrase"],
+            validity_days=module.params["validity_days"],
+            delta_threshold=module.params["delta_threshold"],
+            check_mode=module.check_mode,
+        )
+    except (OSError, ValueError, TypeError) as e:
+        module.fail_json(msg=f"Failed to update the strongSwan CRLs: {e}")
+
+    module.exit_json(**result)
+
+
+def main():
+    """Entry point when module is executed directly."""
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+#!/usr/bin/python
+
+# strongswan_pki.py - Ansible module to issue strongSwan client certificates for a whole
+# user list in a single invocation.
+#
+# Why: one community.crypto task per user per artifact (key, CSR, certificate, two p12
+# bundles, OpenSSH public key) spawns thousands of module processes on large deployments.
+
+import datetime
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from ansible.module_utils.basic import AnsibleModule
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.serialization import pkcs12
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+"""
+Ansible module to issue strongSwan client certificates in bulk.
+
+For every user the following files are maintained below pki_path, using the
+same layout as the per-user community.crypto tasks this module replaces:
+
+- private/<user>.key: ECC secp384r1 private key (0600)
+- certs/<user>.crt: client certificate signed by cacert.pem/private/cakey.pem (0644)
+- private/<user>.p12 and private/<user>_ca.p12: PKCS#12 bundles without and with the CA (0600)
+- public/<user>.pub: OpenSSH public key
+
+Certificates are built directly from the private key, without an intermediate
+CSR. Existing keys are never regenerated; a certificate is only re-issued when
+it no longer matches its key, the CA or the expected subject, or is expired,
+and p12 bundles are only rebuilt when missing, when their certificate changed or
+when they do not open with the current p12 passphrase.
+Users are processed in a process pool sized to the CPU count.
+
+Parameters:
+- pki_path: strongSwan PKI directory (ipsec_pki_path)
+- users: List of client user names
+- ca_passphrase: Passphrase of private/cakey.pem
+- p12_passphrase: Passphrase of the p12 bundles
+- email_domain: Domain of the email SAN (openssl_constraint_random_id)
+- validity_days: Certificate lifetime in days
+- encryption_level: PKCS#12 encryption, compatibility2022 (Apple devices) or auto
+- manual_path: Optional directory that receives a copy of every <user>.p12
+- workers: Number of worker processes, 0 for the CPU count
+
+Returns:
+- changed: Whether any file was created or modified
+- issued: Users whose certificate was (re-)issued
+"""
+
+IPSEC_END_ENTITY = x509.ObjectIdentifier("1.3.6.1.5.5.7.3.17")
+
+# Populated once per worker process by init_worker
+_ctx = {}
+
+
+def read_file(path):
+    """Return the content of a file as bytes, or None if it does not exist."""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def write_file(path, data, mode):
+    """Atomically write data to path with the given permissions."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def init_worker(params):
+    """Load the CA once per worker process."""
+    pki_path = params["pki_path"]
+    _ctx.clear()
+    _ctx.update(params)
+    _ctx["ca_cert"] = x509.load_pem_x509_certificate(read_file(os.path.join(pki_path, "cacert.pem")))
+    _ctx["ca_key"] = serialization.load_pem_private_key(
+        read_file(os.path.join(pki_path, "private", "cakey.pem")),
+        password=params["ca_passphrase"].encode() if params["ca_passphrase"] else None,
+    )
+
+
+def p12_encryption(passphrase, encryption_level):
+    """Return the PKCS#12 encryption matching community.crypto's encryption_level."""
+    if not passphrase:
+        return serialization.NoEncryption()
+    if encryption_level == "compatibility2022":
+        return (
+            serialization.PrivateFormat.PKCS12.encryption_builder()
+            .kdf_rounds(50000)
+            .key_cert_algorithm(pkcs12.PBES.PBESv1SHA1And3KeyTripleDESCBC)
+            .hmac_hash(hashes.SHA1())
+            .build(passphrase.encode())
+        )
+    return serialization.BestAvailableEncryption(passphrase.encode())
+
+
+def p12_is_current(path, passphrase, cert):
+    """Check that a p12 bundle exists, opens with the passphrase and holds the certificate."""
+    data = read_file(path)
+    if data is None:
+        return False
+    try:
+        _, bundled_cert, _ = pkcs12.load_key_and_certificates(data, passphrase.encode() if passphrase else None)
+    except ValueError:
+        return False
+    return bundled_cert == cert
+
+
+def certificate_is_valid(cert, key, user):
+    """Check that an existing certificate still matches its key, the CA and the expected subject."""
+    ca_cert = _ctx["ca_cert"]
+    public_format = (serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+
+    if cert.public_key().public_bytes(*public_format) != key.public_key().public_bytes(*public_format):
+        return False
+    if cert.issuer != ca_cert.subject:
+        return False
+    if [cn.value for cn in cert.subject.get_attributes_for_oid(NameOID.COMMON_NAME)] != [user]:
+        return False
+    if cert.not_valid_after_utc <= datetime.datetime.now(datetime.UTC):
+        return False
+    try:
+        san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+    except x509.ExtensionNotFound:
+        return False
+    if san.get_values_for_type(x509.RFC822Name) != [f"{user}@{_ctx['email_domain']}"]:
+        return False
+    try:
+        ca_cert.public_key().verify(cert.signature, cert.tbs_certificate_bytes, ec.ECDSA(cert.signature_hash_algorithm))
+    except InvalidSignature:
+        return False
+    return True
+
+
+def build_certificate(key, user):
+    """Sign a client certificate for user with the CA."""
+    ca_cert = _ctx["ca_cert"]
+    ca_key = _ctx["ca_key"]
+    now = datetime.datetime.now(datetime.UTC)
+
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, user)]))
+        .issuer_name(ca_cert.subject)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=_ctx["validity_days"]))
+        # UUID domain prevents certificate reuse across deployments
+        .add_extension(x509.SubjectAlternativeName([x509.RFC822Name(f"{user}@{_ctx['email_domain']}")]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=False)
+        .add_extension(
+            x509.KeyUsage(
+                digital_signature=True,
+                content_commitment=False,
+                key_encipherment=True,
+                data_encipherment=False,
+                key_agreement=False,
+                key_cert_sign=False,
+                crl_sign=False,
+                encipher_only=False,
+                decipher_only=False,
+            ),
+            critical=False,
+        )
+        # Client certs restricted to clientAuth only - serverAuth deliberately excluded
+        # to prevent server impersonation attacks
+        .add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.CLIENT_AUTH, IPSEC_END_ENTITY]), critical=False)
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(key.public_key()), critical=False)
+        .add_extension(
+            x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key()),
+            critical=False,
+        )
+    )
+    return builder.sign(ca_key, hashes.SHA256())
+
+
+def issue_user(user):
+    """
+    Reconcile all PKI files of one user.
+
+    Runs inside a worker process. Returns a tuple of (user, issued, changed).
+    """
+    pki_path = _ctx["pki_path"]
+    check_mode = _ctx["check_mode"]
+    key_path = os.path.join(pki_path, "private", user + ".key")
+    cert_path = os.path.join(pki_path, "certs", user + ".crt")
+    p12_path = os.path.join(pki_path, "private", user + ".p12")
+    p12_ca_path = os.path.join(pki_path, "private", user + "_ca.p12")
+    pub_path = os.path.join(pki_path, "public", user + ".pub")
+    changed = False
+
+    key_pem = read_file(key_path)
+    if key_pem is None:
+        key = ec.generate_private_key(ec.SECP384R1())
+        if not check_mode:
+            write_file(
+                key_path,
+                key.private_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PrivateFormat.TraditionalOpenSSL,
+                    serialization.NoEncryption(),
+                ),
+                0o600,
+            )
+        changed = True
+    else:
+        key = serialization.load_pem_private_key(key_pem, password=None)
+
+    cert_pem = read_file(cert_path)
+    cert = x509.load_pem_x509_certificate(cert_pem) if cert_pem else None
+    issued = cert is None or not certificate_is_valid(cert, key, user)
+    if issued:
+        cert = build_certificate(key, user)
+        if not check_mode:
+            write_file(cert_path, cert.public_bytes(serialization.Encoding.PEM), 0o644)
+        changed = True
+
+    encryption = p12_encryption(_ctx["p12_passphrase"], _ctx["encryption_level"])
+    bundles = ((p12_path, None), (p12_ca_path, [_ctx["ca_cert"]]))
+    if _ctx["manual_path"]:
+        bundles += ((os.path.join(_ctx["manual_path"], user + ".p12"), None),)
+    p12_cache = {}
+    for path, cas in bundles:
+        # The passphrase (p12_export_password) is random per run unless pinned, and the
+        # mobileconfig profiles embed it next to the bundle, so it has to open with it
+        if issued or not p12_is_current(path, _ctx["p12_passphrase"], cert):
+            if not check_mode:
+                cache_key = cas is not None
+                if cache_key not in p12_cache:
+                    p12_cache[cache_key] = pkcs12.serialize_key_and_certificates(
+                        user.encode(), key, cert, cas, encryption
+                    )
+                write_file(path, p12_cache[cache_key], 0o600)
+            changed = True
+
+    pub_ssh = key.public_key().public_bytes(serialization.Encoding.OpenSSH, serialization.PublicFormat.OpenSSH)
+    if read_file(pub_path) != pub_ssh + b"\n":
+        if not check_mode:
+            write_file(pub_path, pub_ssh + b"\n", 0o644)
+        changed = True
+
+    return user, issued, changed
+
+
+def worker_count(requested, jobs):
+    """Size the process pool from the CPU count and the amount of work."""
+    workers = requested or os.cpu_count() or 1
+    return max(1, min(workers, jobs))
+
+
+def issue_certificates(params, users):
+    """
+    Issue certificates for all users, in parallel when more than one worker is useful.
+
+    Returns a result dict suitable for module.exit_json.
+    """
+    result = {"changed": False, "issued": []}
+    users = list(dict.fromkeys(users))
+
+    for subdir in ("certs", "private", "public"):
+        path = os.path.join(params["pki_path"], subdir)
+        if not os.path.isdir(path) and not params["check_mode"]:
+            os.makedirs(path, mode=0o700, exist_ok=True)
+    if params["manual_path"] and not params["check_mode"]:
+        os.makedirs(params["manual_path"], mode=0o700, exist_ok=True)
+
+    workers = worker_count(params["workers"], len(users))
+    # Forked workers inherit the loaded module; spawn would need to re-import it.
+    if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=init_worker,
+            initargs=(params,),
+        ) as pool:
+            outcomes = list(pool.map(issue_user, users))
+    else:
+        init_worker(params)
+        outcomes = [issue_user(user) for user in users]
+
+    for user, issued, changed in outcomes:
+        if issued:
+            result["issued"].append(user)
+        if changed:
+            result["changed"] = True
+
+    return result
+
+
+def run_module():
+    """
+    Main execution function for the strongswan_pki Ansible module.
+
+    Validates parameters and issues the certificates for all requested users.
+    """
+    module_args = {
+        "pki_path": {"type": "path", "required": True},
+        "users": {"type": "list", "elements": "str", "required": True},
+        "ca_passphrase": {"type": "str", "required": True, "no_log": True},
+        "p12_passphrase": {"type": "str", "required": True, "no_log": True},
+        "email_domain": {"type": "str", "required": True},
+        "validity_days": {"type": "int", "default": 3650},
+        "encryption_level": {"type": "str", "default": "compatibility2022", "choices": ["auto", "compatibility2022"]},
+        "manual_path": {"type": "path", "required": False},
+        "workers": {"type": "int", "default": 0},
+    }
+
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+
+    users = [str(u) for u in module.params["users"]]
+    invalid = [u for u in users if not u or "/" in u or u.startswith(".")]
+    if invalid:
+        module.fail_json(msg=f"Invalid user names for certificate file paths: {invalid}")
+
+    params = {key: module.params[key] for key in module_args if key != "users"}
+    params["check_mode"] = module.check_mode
+
+    try:
+        result = issue_certificates(params, users)
+    except (OSError, ValueError, TypeError) as e:
+        module.fail_json(msg=f"Failed to issue strongSwan certificates: {e}")
+
+    module.exit_json(**result)
+
+
+def main():
+    """Entry point when module is executed directly."""
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
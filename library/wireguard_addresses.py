@@ -0,0 +1,251 @@
+#!/usr/bin/python
+
+# wireguard_addresses.py - Ansible module to maintain the WireGuard peer address allocation table.
+#
+# Why: computing every peer address with ipmath from the position of the user in index.txt
+# re-parses the networks once per peer and template, and ties addresses to list order.
+
+import ipaddress
+import itertools
+import json
+import os
+import tempfile
+
+from ansible.module_utils.basic import AnsibleModule
+
+"""
+Ansible module to allocate stable WireGuard peer addresses.
+
+The allocation table is a JSON file mapping every user that ever had an
+address to its host number within the WireGuard networks; host 1 is the
+server. New users get the next unused host number, and entries are never
+reused or reordered, so removing a user does not move anybody else and a
+user that is added again gets its old address back. Because only host
+numbers are stored, the table stays valid if the networks change.
+
+With several shards (WireGuard interfaces), the networks are split into
+equal slices, one per shard, and the first host of every slice is the
+server address of that shard. A host number lies in the slice of its shard,
+so the shard of a peer follows from its address. New users go to the shard
+with the fewest peers. Going from one shard to more keeps the existing
+peers in the first slice, on the original interface. Peers whose host
+number no longer fits a valid slice after the shard count changed are
+allocated a new one.
+
+When the table does not exist yet it is seeded from index.txt, where the
+user on line N had host number N + 1, so existing client configs keep
+their addresses.
+
+Parameters:
+- path: Allocation table file
+- users: Users that need an address
+- network_ipv4: WireGuard IPv4 network (wireguard_network_ipv4)
+- network_ipv6: Optional WireGuard IPv6 network (wireguard_network_ipv6)
+- index_path: Optional index.txt to seed a new table from
+- shards: Number of WireGuard interfaces the users are spread over
+
+Returns:
+- changed: Whether the table was created or modified
+- addresses: Mapping of user to its ipv4 (and ipv6) address and shard, in allocation order
+- added: Users that were allocated an address in this run
+- moved: Users whose shard or IPv6 address changed with the shard count
+- shards: Server ipv4 (and ipv6) interface address, with prefix length, of every shard
+"""
+
+
+def read_lines(path):
+    """Return the non-empty lines of a file, or an empty list if it does not exist."""
+    try:
+        with open(path) as f:
+            return [line.strip() for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def load_table(path, index_path=None):
+    """
+    Load the allocation table, seeding it from index.txt if it does not exist yet.
+
+    Returns the host numbers and the shard count they were allocated for.
+    """
+    try:
+        with open(path) as f:
+            table = json.load(f)
+        return table["hosts"], table.get("shards", 1)
+    except FileNotFoundError:
+        pass
+    users = dict.fromkeys(read_lines(index_path)) if index_path else {}
+    return {user: position + 2 for position, user in enumerate(users)}, 1
+
+
+def write_table(path, hosts, shards=1):
+    """Atomically write the allocation table."""
+    table = {"hosts": hosts}
+    if shards > 1:
+        table["shards"] = shards
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(table, f, indent=2)
+            f.write("\n")
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def host_address(network, host):
+    """Return the address of a host number within a network."""
+    if host >= network.num_addresses - (1 if network.version == 4 else 0):
+        raise ValueError(f"{network} has no room for host number {host}")
+    return str(network.network_address + host)
+
+
+def split(networks, shards):
+    """Split every network into equal slices, returning the slices of the first shards."""
+    bits = (shards - 1).bit_length()
+    slices = {}
+    for family, network in networks.items():
+        if network.prefixlen + bits > network.max_prefixlen - 2:
+            raise ValueError(f"{network} is too small for {shards} shards")
+        slices[family] = list(itertools.islice(network.subnets(prefixlen_diff=bits), shards))
+    return slices
+
+
+def locate(host, slices):
+    """Return the shard and the host number within its slice, or None if the host is not valid there."""
+    size = slices["ipv4"][0].num_addresses
+    shard, offset = divmod(host, size)
+    # Offset 0 is the network, 1 the server and the last one the broadcast address of the slice
+    if shard >= len(slices["ipv4"]) or offset < 2 or offset >= size - 1:
+        return None
+    return shard, offset
+
+
+def assign(host, slices):
+    """Return the addresses and the shard of a host number."""
+    shard, offset = locate(host, slices)
+    address = {family: host_address(networks[shard], offset) for family, networks in slices.items()}
+    address["shard"] = shard
+    return address
+
+
+def allocate(hosts, users, slices):
+    """
+    Allocate host numbers for users missing from the table or no longer in a valid slice, in place.
+
+    Returns the users that were added.
+    """
+    size = slices["ipv4"][0].num_addresses
+    for user, host in list(hosts.items()):
+        if locate(host, slices) is None:
+            del hosts[user]
+    wanted = dict.fromkeys(users)
+    peers = [0] * len(slices["ipv4"])
+    next_offset = [2] * len(slices["ipv4"])
+    for user, host in hosts.items():
+        shard, offset = locate(host, slices)
+        next_offset[shard] = max(next_offset[shard], offset + 1)
+        if user in wanted:
+            peers[shard] += 1
+
+    added = []
+    for user in wanted:
+        if user in hosts:
+            continue
+        shard = peers.index(min(peers))
+        for networks in slices.values():
+            host_address(networks[shard], next_offset[shard])
+        hosts[user] = shard * size + next_offset[shard]
+        added.append(user)
+        next_offset[shard] += 1
+        peers[shard] += 1
+    return added
+
+
+def allocate_addresses(path, users, network_ipv4, network_ipv6=None, index_path=None, shards=1, check_mode=False):
+    """
+    Allocate addresses for all users and return them with the table changes.
+
+    Returns a result dict suitable for module.exit_json.
+    """
+    if shards < 1:
+        raise ValueError(f"Invalid number of shards: {shards}")
+    networks = {"ipv4": ipaddress.IPv4Network(network_ipv4, strict=False)}
+    if network_ipv6:
+        networks["ipv6"] = ipaddress.IPv6Network(network_ipv6, strict=False)
+    slices = split(networks, shards)
+
+    exists = os.path.exists(path)
+    hosts, previous_shards = load_table(path, index_path)
+    previous = dict(hosts)
+    added = allocate(hosts, users, slices)
+    changed = bool(added) or not exists or hosts != previous or shards != previous_shards
+    if changed and not check_mode:
+        write_table(path, hosts, shards)
+
+    wanted = set(users)
+    addresses = {
+        user: assign(host, slices) for user, host in sorted(hosts.items(), key=lambda item: item[1]) if user in wanted
+    }
+    moved = []
+    if shards != previous_shards:
+        previous_slices = split(networks, previous_shards)
+        moved = [
+            user
+            for user, address in addresses.items()
+            if user not in added
+            and (locate(hosts[user], previous_slices) is None or assign(hosts[user], previous_slices) != address)
+        ]
+    servers = [
+        {
+            family: f"{host_address(family_slices[shard], 1)}/{family_slices[shard].prefixlen}"
+            for family, family_slices in slices.items()
+        }
+        for shard in range(shards)
+    ]
+    return {"changed": changed, "addresses": addresses, "added": added, "moved": moved, "shards": servers}
+
+
+def run_module():
+    """
+    Main execution function for the wireguard_addresses Ansible module.
+
+    Validates parameters and allocates addresses for all requested users.
+    """
+    module_args = {
+        "path": {"type": "path", "required": True},
+        "users": {"type": "list", "elements": "str", "required": True},
+        "network_ipv4": {"type": "str", "required": True},
+        "network_ipv6": {"type": "str", "required": False},
+        "index_path": {"type": "path", "required": False},
+        "shards": {"type": "int", "default": 1},
+    }
+
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+
+    try:
+        result = allocate_addresses(
+            module.params["path"],
+            [str(u) for u in module.params["users"]],
+            module.params["network_ipv4"],
+            module.params["network_ipv6"],
+            module.params["index_path"],
+            shards=module.params["shards"],
+            check_mode=module.check_mode,
+        )
+    except (OSError, ValueError, KeyError) as e:
+        module.fail_json(msg=f"Failed to allocate WireGuard addresses: {e}")
+
+    module.exit_json(**result)
+
+
+def main():
+    """Entry point when module is executed directly."""
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/python
+
+# wireguard_keys.py - Ansible module to generate WireGuard key material for a whole user list
+# in a single invocation.
+#
+# Why: generating private, preshared and public keys with one task per user per key type
+# costs several module round-trips per user, which dominates update-users at scale.
+
+import base64
+import os
+import tempfile
+
+from ansible.module_utils.basic import AnsibleModule
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import x25519
+
+"""
+Ansible module to generate WireGuard keys for many users at once.
+
+For every user the following files are maintained below pki_path, using the
+same layout as the per-user tasks this module replaces:
+
+- private/<user>.raw and private/<user>: raw and base64 X25519 private key (0600)
+- preshared/<user>.raw and preshared/<user>: raw and base64 preshared key (0600)
+- public/<user>: base64 X25519 public key derived from the private key (0644)
+
+Existing keys are never regenerated. Missing derived files (base64 copies,
+public keys) are rebuilt from the raw key material that is already on disk.
+
+Parameters:
+- pki_path: WireGuard PKI directory (wireguard_pki_path)
+- users: List of user names (including the server) to generate keys for
+
+Returns:
+- changed: Whether any file was created or modified
+- public_keys: Mapping of user name to base64-encoded public key
+- created: Users whose private key was newly generated
+"""
+
+KEY_DIRS = ("private", "preshared", "public")
+
+
+def read_raw_key(path):
+    """
+    Read a 32-byte X25519 key stored either as raw bytes or base64 text.
+
+    Returns None if the file does not exist.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+
+    # Raw keys must not be stripped - they can contain whitespace-like bytes
+    if len(data) == 32:
+        return data
+
+    raw = base64.b64decode(data.strip(), validate=True)
+    if len(raw) != 32:
+        raise ValueError(f"{path}: key must decode to exactly 32 bytes, got {len(raw)}")
+    return raw
+
+
+def read_text(path):
+    """Return the stripped text content of a file, or None if it does not exist."""
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def write_file(path, data, mode):
+    """Atomically write data to path with the given permissions."""
+    if isinstance(data, str):
+        data = data.encode()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def generate_raw_key():
+    """Generate a raw 32-byte X25519 private key."""
+    return x25519.X25519PrivateKey.generate().private_bytes(
+        encoding=serialization.Encoding.Raw,
+        format=serialization.PrivateFormat.Raw,
+        encryption_algorithm=serialization.NoEncryption(),
+    )
+
+
+def derive_public_key(priv_raw):
+    """Derive the base64-encoded X25519 public key from a raw private key."""
+    pub_raw = (
+        x25519.X25519PrivateKey.from_private_bytes(priv_raw)
+        .public_key()
+        .public_bytes(encoding=serialization.Encoding.Raw, format=serialization.PublicFormat.Raw)
+    )
+    return base64.b64encode(pub_raw).decode()
+
+
+def ensure_key(pki_path, kind, user, check_mode):
+    """
+    Ensure the raw and base64 files of one key exist and agree with each other.
+
+    Returns a tuple of (raw key, created, changed).
+    """
+    raw_path = os.path.join(pki_path, kind, user + ".raw")
+    b64_path = os.path.join(pki_path, kind, user)
+
+    raw = read_raw_key(raw_path)
+    created = False
+    changed = False
+
+    if raw is None:
+        # Fall back to an existing base64 copy before generating a new key
+        raw = read_raw_key(b64_path)
+        if raw is None:
+            raw = generate_raw_key()
+            created = True
+        if not check_mode:
+            write_file(raw_path, raw, 0o600)
+        changed = True
+
+    b64 = base64.b64encode(raw).decode()
+    if read_text(b64_path) != b64:
+        if not check_mode:
+            write_file(b64_path, b64, 0o600)
+        changed = True
+
+    return raw, created, changed
+
+
+def generate_keys(pki_path, users, check_mode=False):
+    """
+    Generate or complete WireGuard key material for every user.
+
+    Returns a result dict suitable for module.exit_json.
+    """
+    result = {"changed": False, "public_keys": {}, "created": []}
+
+    for kind in KEY_DIRS:
+        key_dir = os.path.join(pki_path, kind)
+        if not os.path.isdir(key_dir):
+            if not check_mode:
+                os.makedirs(key_dir, mode=0o700, exist_ok=True)
+            result["changed"] = True
+
+    for user in dict.fromkeys(users):
+        priv_raw, created, changed = ensure_key(pki_path, "private", user, check_mode)
+        _, _, psk_changed = ensure_key(pki_path, "preshared", user, check_mode)
+
+        pub_b64 = derive_public_key(priv_raw)
+        pub_path = os.path.join(pki_path, "public", user)
+        if read_text(pub_path) != pub_b64:
+            if not check_mode:
+                write_file(pub_path, pub_b64, 0o644)
+            changed = True
+
+        result["public_keys"][user] = pub_b64
+        if created:
+            result["created"].append(user)
+        if changed or psk_changed:
+            result["changed"] = True
+
+    return result
+
+
+def run_module():
+    """
+    Main execution function for the wireguard_keys Ansible module.
+
+    Validates parameters, generates missing key material and reports
+    the public keys for all requested users.
+    """
+    module_args = {
+        "pki_path": {"type": "path", "required": True},
+        "users": {"type": "list", "elements": "str", "required": True},
+    }
+
+    module = AnsibleModule(argument_spec=module_args, supports_check_mode=True)
+
+    users = [str(u) for u in module.params["users"]]
+    invalid = [u for u in users if not u or "/" in u or u.startswith(".")]
+    if invalid:
+        module.fail_json(msg=f"Invalid user names for key file paths: {invalid}")
+
+    try:
+        result = generate_keys(module.params["pki_path"], users, check_mode=module.check_mode)
+    except (OSError, ValueError) as e:
+        module.fail_json(msg=f"Failed to generate WireGuard keys: {e}")
+
+    module.exit_json(**result)
+
+
+def main():
+    """Entry point when module is executed directly."""
+    run_module()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""Compile the dnscrypt-proxy block list from hosts-style and domain lists.
+
+Sources are downloaded concurrently and streamed line by line, entries are
+deduplicated in a set, whitelisted domains (and their subdomains) are dropped
+with per-label set lookups, and the result is written atomically.
+
+With --cache-dir, downloaded sources are kept on disk keyed by URL and
+revalidated with ETag/Last-Modified, so unchanged lists are not downloaded
+again. The block list is only rewritten when its content hash changes; the
+exit status tells the caller whether dnscrypt-proxy needs to pick it up.
+"""
+
+import argparse
+import hashlib
+import ipaddress
+import json
+import os
+import sys
+import tempfile
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+USER_AGENT = "algo-adblock/1.0"
+EXIT_UPDATED = 0
+EXIT_FAILED = 1
+EXIT_UNCHANGED = 3
+LOCAL_NAMES = frozenset({"local", "broadcasthost", "ip6-allnodes", "ip6-allrouters", "ip6-loopback"})
+
+
+def log(message: str) -> None:
+    print(message, file=sys.stderr)
+
+
+def is_ip_address(value: str) -> bool:
+    try:
+        ipaddress.ip_address(value)
+    except ValueError:
+        return False
+    return True
+
+
+def normalize_domain(token: str) -> str | None:
+    """Normalize a host name, returning None for anything that should not be blocked."""
+    domain = token.strip().lower().rstrip(".")
+    if not domain or "localhost" in domain or domain in LOCAL_NAMES or is_ip_address(domain):
+        return None
+    return domain
+
+
+def parse_line(line: str) -> str | None:
+    """Extract the blocked domain from a hosts-style or plain domain list line."""
+    line = line.split("#", 1)[0].strip()
+    if not line:
+        return None
+    fields = line.split()
+    # Hosts format: "0.0.0.0 example.com"; plain lists: "example.com"
+    if len(fields) > 1 and is_ip_address(fields[0]):
+        return normalize_domain(fields[1])
+    return normalize_domain(fields[0])
+
+
+def parse_lines(lines) -> set[str]:
+    """Parse an iterable of text lines into a set of domains."""
+    domains = set()
+    for line in lines:
+        domain = parse_line(line)
+        if domain:
+            domains.add(domain)
+    return domains
+
+
+def open_source(source: str, timeout: float, headers: dict[str, str] | None = None):
+    """Open a list source, which may be an http(s)/file URL or a local path."""
+    if "://" not in source:
+        return open(source, "rb")
+    # Sources come from adblock_lists in config.cfg
+    request = urllib.request.Request(source, headers={"User-Agent": USER_AGENT, **(headers or {})})  # noqa: S310
+    return urllib.request.urlopen(request, timeout=timeout)  # noqa: S310
+
+
+def cache_paths(cache_dir: str, source: str) -> tuple[Path, Path]:
+    """Return the cached body and metadata paths for a source URL."""
+    key = hashlib.sha256(source.encode()).hexdigest()
+    return Path(cache_dir, key + ".list"), Path(cache_dir, key + ".json")
+
+
+def load_cache_meta(meta_path: Path) -> dict:
+    try:
+        return json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def read_cached(body_path: Path) -> set[str]:
+    with body_path.open(encoding="utf-8", errors="replace") as f:
+        return parse_lines(f)
+
+
+def fetch_cached(source: str, timeout: float, cache_dir: str) -> set[str]:
+    """Fetch a URL with conditional request headers, updating its cache entry.
+
+    A 304 Not Modified response is served from the cached copy. A full response
+    is parsed while it is streamed into the cache.
+    """
+    body_path, meta_path = cache_paths(cache_dir, source)
+    meta = load_cache_meta(meta_path) if body_path.exists() else {}
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = open_source(source, timeout, headers)
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and meta:
+            log(f"Not modified: {source}")
+            return read_cached(body_path)
+        raise
+
+    fd, name = tempfile.mkstemp(dir=cache_dir, prefix=".adblock-")
+    tmp_path = Path(name)
+    try:
+        with response, os.fdopen(fd, "wb") as cached:
+
+            def tee():
+                for raw in response:
+                    cached.write(raw)
+                    yield raw.decode("utf-8", "replace")
+
+            domains = parse_lines(tee())
+        tmp_path.replace(body_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    new_meta = {"url": source}
+    if response.headers.get("ETag"):
+        new_meta["etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        new_meta["last_modified"] = response.headers["Last-Modified"]
+    meta_path.write_text(json.dumps(new_meta))
+    return domains
+
+
+def fetch_source(source: str, timeout: float, retries: int, cache_dir: str | None = None) -> set[str] | None:
+    """Download and parse one source. Returns None if every attempt failed.
+
+    With a cache directory, URL sources are revalidated against the cached copy,
+    which is also used as a fallback when the source cannot be reached.
+    """
+    cached = cache_dir is not None and "://" in source
+    for attempt in range(1, retries + 1):
+        try:
+            if cached:
+                return fetch_cached(source, timeout, cache_dir)
+            with open_source(source, timeout) as response:
+                return parse_lines(raw.decode("utf-8", "replace") for raw in response)
+        except OSError as e:
+            log(f"Failed to fetch {source} (attempt {attempt}/{retries}): {e}")
+
+    if cached:
+        body_path, _ = cache_paths(cache_dir, source)
+        if body_path.exists():
+            log(f"Using cached copy of {source}")
+            return read_cached(body_path)
+    return None
+
+
+def load_list(path: str | None) -> set[str]:
+    """Load a local black/white list, returning an empty set if it does not exist."""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return parse_lines(f)
+
+
+def is_whitelisted(domain: str, whitelist: set[str]) -> bool:
+    """Check a domain and each of its parent domains against the whitelist."""
+    labels = domain.split(".")
+    return any(".".join(labels[i:]) in whitelist for i in range(len(labels)))
+
+
+def compile_blocklist(sources: list[set[str]], whitelist: set[str]) -> list[str]:
+    """Merge, deduplicate and filter the parsed sources into a sorted block list."""
+    blocked = set().union(*sources)
+    if whitelist:
+        blocked = {domain for domain in blocked if not is_whitelisted(domain, whitelist)}
+    return sorted(blocked)
+
+
+def render(lines: list[str]) -> bytes:
+    return "".join(line + "\n" for line in lines).encode()
+
+
+def file_digest(path: str) -> str | None:
+    """Return the SHA-256 of a file, or None if it does not exist."""
+    try:
+        with open(path, "rb") as f:
+            digest = hashlib.sha256()
+            # hashlib.file_digest needs Python 3.11, servers run Ubuntu 22.04's 3.10
+            for chunk in iter(lambda: f.read(1 << 16), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def write_atomic(path: str, data: bytes, mode: int = 0o644) -> None:
+    """Write data to path via a temporary file in the same directory and rename it into place."""
+    fd, name = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".adblock-")
+    tmp_path = Path(name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        tmp_path.chmod(mode)
+        tmp_path.replace(path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", required=True, help="block list file read by dnscrypt-proxy")
+    parser.add_argument("--blacklist", help="local list of additional domains to block")
+    parser.add_argument("--whitelist", help="local list of domains that are never blocked")
+    parser.add_argument("--timeout", type=float, default=10, help="per-request timeout in seconds")
+    parser.add_argument("--retries", type=int, default=3, help="attempts per source")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent downloads")
+    parser.add_argument("--cache-dir", help="directory for cached sources and their ETag/Last-Modified headers")
+    parser.add_argument("sources", nargs="*", help="list URLs or local files")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """Compile the block list.
+
+    Returns EXIT_UPDATED if the block list was rewritten, EXIT_UNCHANGED if the
+    compiled list is identical to the current one and EXIT_FAILED if no source
+    could be fetched.
+    """
+    args = parse_args(argv)
+    if args.cache_dir:
+        Path(args.cache_dir).mkdir(mode=0o700, parents=True, exist_ok=True)
+
+    log("Downloading hosts lists...")
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        fetched = list(
+            pool.map(lambda source: fetch_source(source, args.timeout, args.retries, args.cache_dir), args.sources)
+        )
+
+    sources = [domains for domains in fetched if domains is not None]
+    if args.sources and not sources:
+        log("All block list sources failed, keeping the current block list")
+        return EXIT_FAILED
+
+    sources.append(load_list(args.blacklist))
+    # Wildcard whitelist entries match the same subdomains as plain ones
+    whitelist = {domain.removeprefix("*.").lstrip("=") for domain in load_list(args.whitelist)}
+    blocklist = compile_blocklist(sources, whitelist)
+
+    data = render(blocklist)
+    if hashlib.sha256(data).hexdigest() == file_digest(args.output):
+        log(f"Block list unchanged ({len(blocklist)} domains)")
+        return EXIT_UNCHANGED
+
+    write_atomic(args.output, data)
+    log(f"Wrote {len(blocklist)} domains to {args.output}")
+    return EXIT_UPDATED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Deploy the Algo VPN servers of a fleet manifest in parallel."""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import yaml
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+# Python extras of the providers, as installed by playbooks/cloud-pre.yml
+PROVIDER_EXTRAS = {
+    "ec2": "aws",
+    "lightsail": "aws",
+    "azure": "azure",
+    "gce": "gcp",
+    "hetzner": "hetzner",
+    "linode": "linode",
+    "openstack": "openstack",
+    "cloudstack": "cloudstack",
+}
+
+
+class ManifestError(Exception):
+    """The fleet manifest is invalid."""
+
+
+def load_manifest(path: Path) -> dict:
+    """Read a fleet manifest and check its servers."""
+    with open(path) as f:
+        manifest = yaml.safe_load(f) or {}
+    servers = manifest.get("servers")
+    if not isinstance(servers, list) or not servers:
+        raise ManifestError(f"{path}: 'servers' must be a non-empty list")
+    defaults = manifest.get("defaults") or {}
+    names = set()
+    for i, server in enumerate(servers, 1):
+        if not isinstance(server, dict) or not server.get("server_name"):
+            raise ManifestError(f"{path}: server {i} has no server_name")
+        name = str(server["server_name"])
+        if "/" in name or name.startswith("."):
+            raise ManifestError(f"{path}: server_name {name} is not a valid file name")
+        if name in names:
+            raise ManifestError(f"{path}: server_name {name} is used more than once")
+        names.add(name)
+        if "provider" not in server and "provider" not in defaults:
+            raise ManifestError(f"{path}: server {name} has no provider")
+    return manifest
+
+
+def server_vars(manifest: dict) -> list[dict]:
+    """Return the extra variables of each server: the defaults, the shared users, then the server's own."""
+    shared = dict(manifest.get("defaults") or {})
+    if manifest.get("users"):
+        shared["users"] = manifest["users"]
+    return [{**shared, **server} for server in manifest["servers"]]
+
+
+def ensure_ssh_key(private: Path, public: Path) -> bool:
+    """
+    Create the SSH key used for all servers, if it does not exist yet.
+
+    Each deployment would otherwise try to create the same key at the same
+    time. The key has the format of the one playbooks/cloud-pre.yml creates:
+    a 4096-bit RSA key in traditional PEM and an OpenSSH public key. Returns
+    whether a key was created.
+    """
+    if private.exists():
+        return False
+    key = rsa.generate_private_key(public_exponent=65537, key_size=4096)
+    private.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(private, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.TraditionalOpenSSL,
+                serialization.NoEncryption(),
+            )
+        )
+    public.write_bytes(
+        key.public_key().public_bytes(serialization.Encoding.OpenSSH, serialization.PublicFormat.OpenSSH)
+    )
+    return True
+
+
+def install_extras(variables: list[dict]) -> bool:
+    """
+    Install the Python dependencies of all providers once, instead of once per deployment.
+
+    Returns whether they are in place, so that the deployments can skip installing them.
+    """
+    extras = sorted({PROVIDER_EXTRAS[v["provider"]] for v in variables if v["provider"] in PROVIDER_EXTRAS})
+    if not extras:
+        return True
+    if not shutil.which("uv"):
+        return False
+    subprocess.run(["uv", "pip", "install", f".[{','.join(extras)}]"], check=True, stdout=subprocess.DEVNULL)
+    return True
+
+
+def deploy(variables: dict, ansible_args: list[str], log_dir: Path) -> int:
+    """Run main.yml for one server. Returns the exit code of ansible-playbook."""
+    log_file = log_dir / f"{variables['server_name']}.log"
+    # The variables can hold provider credentials, so they are passed in a private file
+    fd, vars_file = tempfile.mkstemp(prefix="algo-fleet-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(variables, f)
+        with open(log_file, "w") as log:
+            return subprocess.run(
+                ["ansible-playbook", "main.yml", "-e", "@" + vars_file, *ansible_args],
+                stdin=subprocess.DEVNULL,
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                check=False,
+            ).returncode
+    finally:
+        os.unlink(vars_file)
+
+
+def run_fleet(variables: list[dict], parallel: int, run, report=print) -> dict:
+    """
+    Call run(server_variables) for every server, at most parallel at a time.
+
+    Returns a mapping of server name to exit code; exceptions count as failures.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, parallel)) as executor:
+        futures = {executor.submit(run, v): str(v["server_name"]) for v in variables}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                rc = future.result()
+            except Exception as e:  # Report the server, the others keep running
+                report(f"{name}: failed: {e}")
+                rc = 1
+            else:
+                report(f"{name}: {'ok' if rc == 0 else f'failed (exit code {rc})'}")
+            results[name] = rc
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Deploy the servers of a fleet manifest in parallel.",
+        epilog="Other options are passed to ansible-playbook.",
+    )
+    parser.add_argument("manifest", nargs="?", default="fleet.yml", type=Path, help="Fleet manifest (fleet.yml)")
+    parser.add_argument("-p", "--parallel", type=int, help="Number of servers deployed at the same time")
+    args, ansible_args = parser.parse_known_args()
+
+    try:
+        manifest = load_manifest(args.manifest)
+    except (OSError, yaml.YAMLError, ManifestError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(2)
+    variables = server_vars(manifest)
+    parallel = args.parallel or int(manifest.get("parallel", 4))
+
+    with open("config.cfg") as f:
+        ssh_keys = yaml.safe_load(f)["SSH_keys"]
+    if any(v["provider"] != "local" for v in variables):
+        ensure_ssh_key(Path(ssh_keys["private"]), Path(ssh_keys["public"]))
+    if install_extras(variables):
+        # Options given on the command line come later and take precedence
+        ansible_args = ["-e", "algo_skip_provider_deps=true", *ansible_args]
+
+    log_dir = Path("configs") / ".fleet"
+    log_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Deploying {len(variables)} servers, {parallel} at a time. Logs are in {log_dir}/")
+    results = run_fleet(variables, parallel, lambda v: deploy(v, ansible_args, log_dir))
+    failed = sorted(name for name, rc in results.items() if rc != 0)
+    if failed:
+        print(f"{len(failed)} of {len(results)} servers failed: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"All {len(results)} servers deployed")
+
+
+if __name__ == "__main__":
+    main()
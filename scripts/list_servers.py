@@ -1,32 +1,118 @@
 #!/usr/bin/env python3
 """List deployed Algo VPN servers as JSON."""
 
+import argparse
 import json
+import os
 import sys
+import tempfile
+from fnmatch import fnmatch
 from pathlib import Path
 
 import yaml
 
+# The C loader is much faster on large config trees, when PyYAML was built with it
+_Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
-def list_servers(configs_dir: Path) -> list[dict]:
-    """Scan configs directory for deployed server metadata."""
+INDEX_VERSION = 1
+
+# Filter name to .config.yml key
+FILTERS = {
+    "provider": "algo_provider",
+    "region": "algo_region",
+    "name": "algo_server_name",
+}
+
+
+def _load_config(config_file: Path):
+    """Parse a config, with the values the index stores: scalars YAML has but JSON lacks become strings."""
+    with open(config_file) as f:
+        config = yaml.load(f, Loader=_Loader)  # noqa: S506 - a safe loader
+    return json.loads(json.dumps(config, default=str))
+
+
+def _read_index(index_file: Path) -> dict:
+    """Return the entries of the index, or none if it is missing or unreadable."""
+    try:
+        with open(index_file) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+        return {}
+    return index.get("servers") or {}
+
+
+def _write_index(index_file: Path, entries: dict) -> None:
+    """Write the index atomically. The index is only a cache, so failures are ignored."""
+    try:
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(dir=index_file.parent, prefix=".servers-")
+        tmp = Path(name)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": INDEX_VERSION, "servers": entries}, f)
+            tmp.replace(index_file)
+        except BaseException:
+            tmp.unlink()
+            raise
+    except OSError:
+        pass
+
+
+def list_servers(configs_dir: Path, index_file: Path | None = None) -> list[dict]:
+    """
+    Scan configs directory for deployed server metadata.
+
+    With an index file, only the configs that were added or changed since the
+    last scan (by modification time and size) are parsed again.
+    """
+    entries = _read_index(index_file) if index_file else {}
+    updated = {}
     servers = []
     for config_file in sorted(configs_dir.glob("*/.config.yml")):
-        with open(config_file) as f:
-            config = yaml.safe_load(f)
-        if config:
-            servers.append(config)
+        key = config_file.relative_to(configs_dir).as_posix()
+        st = config_file.stat()
+        entry = entries.get(key)
+        if not entry or entry.get("mtime_ns") != st.st_mtime_ns or entry.get("size") != st.st_size:
+            entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "config": _load_config(config_file)}
+        updated[key] = entry
+        if entry["config"]:
+            servers.append(entry["config"])
+    if index_file and updated != entries:
+        _write_index(index_file, updated)
     return servers
 
 
+def filter_servers(servers: list[dict], **filters) -> list[dict]:
+    """Return the servers matching all filters. Values are shell-style patterns, e.g. name="prod-*"."""
+    return [
+        server
+        for server in servers
+        if all(
+            pattern is None or fnmatch(str(server.get(FILTERS[key], "")), pattern) for key, pattern in filters.items()
+        )
+    ]
+
+
 def main() -> None:
-    configs_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("configs")
-    if not configs_dir.is_dir():
+    parser = argparse.ArgumentParser(description="List deployed Algo VPN servers as JSON.")
+    parser.add_argument("configs_dir", nargs="?", default="configs", type=Path)
+    parser.add_argument("--provider", help="Only servers of this provider")
+    parser.add_argument("--region", help="Only servers in this region")
+    parser.add_argument("--name", help="Only servers with this name (shell-style patterns allowed)")
+    parser.add_argument("--index", type=Path, help="Index file (default: CONFIGS_DIR/.cache/servers.json)")
+    parser.add_argument("--no-index", action="store_true", help="Parse every config instead of using the index")
+    args = parser.parse_args()
+
+    if not args.configs_dir.is_dir():
         json.dump([], sys.stdout)
         print()
         sys.exit(0)
-    servers = list_servers(configs_dir)
-    json.dump(servers, sys.stdout, indent=2, default=str)
+    index_file = None if args.no_index else args.index or args.configs_dir / ".cache" / "servers.json"
+    servers = list_servers(args.configs_dir, index_file)
+    servers = filter_servers(servers, provider=args.provider, region=args.region, name=args.name)
+    json.dump(servers, sys.stdout, indent=2)
     print()
 
 
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Refresh the cached region catalogs of all configured cloud providers at once."""
+
+import configparser
+import importlib.util
+import json
+import os
+import sys
+from pathlib import Path
+
+# The fetching and caching is done by the region_catalog module the prompts use
+_module = Path(__file__).resolve().parents[1] / "library" / "region_catalog.py"
+_spec = importlib.util.spec_from_file_location("region_catalog", str(_module))
+region_catalog = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(region_catalog)
+
+
+def configured_providers(env: dict) -> tuple[dict, dict]:
+    """Return the credentials and cache scopes of the providers configured in the environment."""
+    credentials = {}
+    scopes = {}
+    if env.get("DO_API_TOKEN"):
+        credentials["digitalocean"] = {"token": env["DO_API_TOKEN"]}
+    if env.get("VULTR_API_CONFIG"):
+        config = configparser.ConfigParser()
+        config.read(env["VULTR_API_CONFIG"])
+        credentials["vultr"] = {"api_key": config.get("default", "key", fallback="")}
+    if env.get("LINODE_API_TOKEN"):
+        credentials["linode"] = {"token": env["LINODE_API_TOKEN"]}
+    if env.get("AWS_ACCESS_KEY_ID") and env.get("AWS_SECRET_ACCESS_KEY"):
+        credentials["lightsail"] = {"access_key": env["AWS_ACCESS_KEY_ID"], "secret_key": env["AWS_SECRET_ACCESS_KEY"]}
+    if env.get("GCE_CREDENTIALS_FILE_PATH"):
+        with open(env["GCE_CREDENTIALS_FILE_PATH"]) as f:
+            project = json.load(f).get("project_id") or env.get("GCE_PROJECT")
+        credentials["gce"] = {"service_account_file": env["GCE_CREDENTIALS_FILE_PATH"], "project": project}
+        scopes["gce"] = project
+    return credentials, scopes
+
+
+def main() -> None:
+    cache_path = sys.argv[1] if len(sys.argv) > 1 else "configs/.cache"
+    credentials, scopes = configured_providers(dict(os.environ))
+    if not credentials:
+        print(
+            "No cloud provider credentials found. Set DO_API_TOKEN, VULTR_API_CONFIG, LINODE_API_TOKEN, "
+            "AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY or GCE_CREDENTIALS_FILE_PATH.",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+    results = region_catalog.refresh_all(cache_path, credentials, scopes)
+    failed = False
+    for provider, result in sorted(results.items()):
+        if isinstance(result, Exception):
+            failed = True
+            print(f"{provider}: failed: {result}")
+        else:
+            print(f"{provider}: {result} regions")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
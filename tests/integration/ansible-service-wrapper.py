@@ -18,6 +18,7 @@ known_services = [
     "netfilter-persistent",
     "iptables",
     "wg-quick@wg0",
+    "strongswan",
     "strongswan-starter",
     "ipsec",
     "apparmor",
@@ -0,0 +1,287 @@
+"""Tests for the adblock list compiler shipped with the dns role (roles/dns/files/adblock.py)."""
+
+import importlib.util
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+
+# Load adblock module from roles/dns/files/ (not a Python package)
+_script = Path(__file__).resolve().parents[2] / "roles" / "dns" / "files" / "adblock.py"
+_templates = _script.parents[1] / "templates"
+_spec = importlib.util.spec_from_file_location("adblock", str(_script))
+adblock = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(adblock)
+
+HOSTS_LIST = """\
+# Title: test hosts
+127.0.0.1 localhost
+::1 localhost ip6-localhost
+255.255.255.255 broadcasthost
+0.0.0.0 0.0.0.0
+
+0.0.0.0 ads.example.com
+0.0.0.0 Tracker.Example.NET.  # trailing comment
+127.0.0.1 shared.example.org
+"""
+
+DOMAIN_LIST = """\
+shared.example.org
+malware.example.io
+cdn.good.example.com
+"""
+
+
+@pytest.fixture
+def sources(tmp_path):
+    hosts = tmp_path / "hosts.txt"
+    hosts.write_text(HOSTS_LIST)
+    domains = tmp_path / "domains.txt"
+    domains.write_text(DOMAIN_LIST)
+    return [str(hosts), domains.as_uri()]
+
+
+@pytest.mark.parametrize(
+    "line,expected",
+    [
+        ("0.0.0.0 ads.example.com", "ads.example.com"),
+        ("127.0.0.1   Ads.Example.COM.", "ads.example.com"),
+        ("ads.example.com", "ads.example.com"),
+        ("0.0.0.0 ads.example.com # comment", "ads.example.com"),
+        ("# 0.0.0.0 ads.example.com", None),
+        ("127.0.0.1 localhost", None),
+        ("::1 ip6-localhost", None),
+        ("255.255.255.255 broadcasthost", None),
+        ("0.0.0.0 0.0.0.0", None),
+        ("   ", None),
+    ],
+)
+def test_parse_line(line, expected):
+    assert adblock.parse_line(line) == expected
+
+
+def test_whitelist_matches_subdomains():
+    """Whitelisting a domain also allows its subdomains, but not its parents."""
+    whitelist = {"good.example.com"}
+    assert adblock.is_whitelisted("good.example.com", whitelist)
+    assert adblock.is_whitelisted("cdn.good.example.com", whitelist)
+    assert not adblock.is_whitelisted("example.com", whitelist)
+    assert not adblock.is_whitelisted("notgood.example.com", whitelist)
+
+
+def test_compile_deduplicates_and_sorts():
+    result = adblock.compile_blocklist([{"b.com", "a.com"}, {"a.com", "c.com"}], set())
+    assert result == ["a.com", "b.com", "c.com"]
+
+
+def test_main_compiles_local_sources(tmp_path, sources):
+    """Lists are merged with the black list, filtered by the white list and written out."""
+    blacklist = tmp_path / "black.list"
+    blacklist.write_text("extra.example.com\n")
+    whitelist = tmp_path / "white.list"
+    whitelist.write_text("# allowed\n*.good.example.com\ntracker.example.net\n")
+    output = tmp_path / "blacklist.txt"
+
+    rc = adblock.main(["--output", str(output), "--blacklist", str(blacklist), "--whitelist", str(whitelist), *sources])
+
+    assert rc == 0
+    assert output.read_text().splitlines() == [
+        "ads.example.com",
+        "extra.example.com",
+        "malware.example.io",
+        "shared.example.org",
+    ]
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".adblock-")]
+
+
+def test_missing_local_lists_are_ignored(tmp_path, sources):
+    output = tmp_path / "blacklist.txt"
+
+    rc = adblock.main(
+        [
+            "--output",
+            str(output),
+            "--blacklist",
+            str(tmp_path / "nope"),
+            "--whitelist",
+            str(tmp_path / "nope"),
+            *sources,
+        ]
+    )
+
+    assert rc == 0
+    assert "cdn.good.example.com" in output.read_text().splitlines()
+
+
+def test_keeps_block_list_when_all_sources_fail(tmp_path):
+    """A failed update never replaces the current block list with an empty one."""
+    output = tmp_path / "blacklist.txt"
+    output.write_text("ads.example.com\n")
+
+    rc = adblock.main(["--output", str(output), "--retries", "1", str(tmp_path / "missing.txt")])
+
+    assert rc == adblock.EXIT_FAILED
+    assert output.read_text() == "ads.example.com\n"
+
+
+def test_partial_failure_uses_remaining_sources(tmp_path, sources):
+    output = tmp_path / "blacklist.txt"
+
+    rc = adblock.main(["--output", str(output), "--retries", "1", str(tmp_path / "missing.txt"), *sources])
+
+    assert rc == 0
+    assert "ads.example.com" in output.read_text().splitlines()
+
+
+def test_cli(tmp_path, sources):
+    """The script runs standalone, as it does from the cron job."""
+    output = tmp_path / "blacklist.txt"
+
+    result = subprocess.run(
+        [sys.executable, str(_script), "--output", str(output), *sources],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert "Wrote 5 domains" in result.stderr
+    assert output.exists()
+
+
+def test_unchanged_block_list_is_not_rewritten(tmp_path, sources):
+    """A compiled list identical to the current one leaves the file alone and says so."""
+    output = tmp_path / "blacklist.txt"
+    assert adblock.main(["--output", str(output), *sources]) == adblock.EXIT_UPDATED
+    mtime = output.stat().st_mtime_ns
+
+    assert adblock.main(["--output", str(output), *sources]) == adblock.EXIT_UNCHANGED
+    assert output.stat().st_mtime_ns == mtime
+
+    (tmp_path / "domains.txt").write_text(DOMAIN_LIST + "new.example.com\n")
+    assert adblock.main(["--output", str(output), *sources]) == adblock.EXIT_UPDATED
+    assert "new.example.com" in output.read_text().splitlines()
+
+
+class ListServer:
+    """Serve a list over HTTP with ETag/Last-Modified revalidation, counting responses."""
+
+    etag = '"v1"'
+    last_modified = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+    def __init__(self, body):
+        self.body = body
+        self.responses = []
+        self.available = True
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if not server.available:
+                    server.responses.append(503)
+                    self.send_error(503)
+                elif self.headers.get("If-None-Match") == server.etag:
+                    server.responses.append(304)
+                    self.send_response(304)
+                    self.end_headers()
+                else:
+                    server.responses.append(200)
+                    body = server.body.encode()
+                    self.send_response(200)
+                    self.send_header("ETag", server.etag)
+                    self.send_header("Last-Modified", server.last_modified)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def list_server():
+    state = ListServer(HOSTS_LIST)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), state.handler())
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    state.url = f"http://127.0.0.1:{httpd.server_port}/hosts"
+    yield state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_cache_revalidates_with_etag(tmp_path, list_server):
+    """Cached sources are revalidated and a 304 is served from the cache."""
+    cache = tmp_path / "cache"
+    output = tmp_path / "blacklist.txt"
+    args = ["--output", str(output), "--cache-dir", str(cache), list_server.url]
+
+    assert adblock.main(args) == adblock.EXIT_UPDATED
+    assert adblock.main(args) == adblock.EXIT_UNCHANGED
+
+    assert list_server.responses == [200, 304]
+    assert "ads.example.com" in output.read_text().splitlines()
+    _, meta_path = adblock.cache_paths(str(cache), list_server.url)
+    meta = adblock.load_cache_meta(meta_path)
+    assert meta["etag"] == ListServer.etag
+    assert meta["last_modified"] == ListServer.last_modified
+
+
+def test_cache_refreshes_changed_source(tmp_path, list_server):
+    """A new ETag replaces the cached body and updates the block list."""
+    cache = tmp_path / "cache"
+    output = tmp_path / "blacklist.txt"
+    args = ["--output", str(output), "--cache-dir", str(cache), list_server.url]
+    adblock.main(args)
+
+    list_server.body = HOSTS_LIST + "0.0.0.0 fresh.example.com\n"
+    list_server.etag = '"v2"'
+
+    assert adblock.main(args) == adblock.EXIT_UPDATED
+    assert list_server.responses == [200, 200]
+    assert "fresh.example.com" in output.read_text().splitlines()
+
+
+def test_cache_used_when_source_unreachable(tmp_path, list_server):
+    """An unreachable source falls back to its cached copy instead of being dropped."""
+    cache = tmp_path / "cache"
+    output = tmp_path / "blacklist.txt"
+    args = ["--output", str(output), "--cache-dir", str(cache), "--retries", "1", list_server.url]
+    adblock.main(args)
+    output.unlink()
+
+    list_server.available = False
+
+    assert adblock.main(args) == adblock.EXIT_UPDATED
+    assert "ads.example.com" in output.read_text().splitlines()
+
+
+def render_template(name, **context):
+    env = Environment(loader=FileSystemLoader(str(_templates)), undefined=StrictUndefined)
+    env.filters["bool"] = lambda value: str(value).lower() in ("true", "1", "yes")
+    return env.get_template(name).render(**context)
+
+
+@pytest.mark.parametrize("hot_reload", [True, False])
+def test_hot_reload_skips_restart(hot_reload):
+    """With hot reload dnscrypt-proxy is never restarted, so its cache survives list updates."""
+    script = render_template(
+        "adblock.sh.j2", adblock_lists=["https://example.com/hosts"], dnscrypt_proxy_hot_reload=hot_reload
+    )
+    settings = render_template(
+        "dnscrypt-proxy/global.toml.j2",
+        dnscrypt_servers={"ipv4": ["cloudflare"], "ipv6": []},
+        ipv6_support=False,
+        uses_systemd_socket=True,
+        dnscrypt_proxy_hot_reload=hot_reload,
+    )
+
+    assert ("systemctl restart dnscrypt-proxy" in script) is not hot_reload
+    assert ("enable_hot_reload = true" in settings) is hot_reload
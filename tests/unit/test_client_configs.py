@@ -0,0 +1,396 @@
+"""Tests for the batch client config rendering module (library/client_configs.py)."""
+
+import base64
+import io
+import json
+import plistlib
+import stat
+from pathlib import Path
+
+import client_configs
+import pytest
+import segno
+from ansible.plugins.filter import core as ansible_filters
+
+ROLES_DIR = Path(__file__).resolve().parents[2] / "roles"
+USERS = ["alice", "bob", "carol"]
+SERVER = "10.0.0.1"
+
+
+@pytest.fixture
+def wireguard(tmp_path):
+    """Fake WireGuard key material and module parameters for the wireguard role templates."""
+    pki = tmp_path / ".pki"
+    for kind in ("private", "preshared"):
+        (pki / kind).mkdir(parents=True)
+        for user in USERS:
+            (pki / kind / user).write_text(f"{kind}-{user}-key=\n")
+    out = tmp_path / "wireguard"
+    return {
+        "template_dirs": [str(ROLES_DIR / "wireguard" / "templates")],
+        "templates": [
+            {"src": "client.conf.j2", "dest": f"{out}/{{user}}.conf", "mode": "0600", "vars": {}},
+            {
+                "src": "mobileconfig.j2",
+                "dest": f"{out}/apple/ios/{{user}}.mobileconfig",
+                "mode": "0600",
+                "vars": {"system": "ios"},
+            },
+        ],
+        "users": USERS,
+        "vars": {
+            "IP_subject_alt_name": SERVER,
+            "algo_server_name": "algo",
+            "algo_ondemand_cellular": False,
+            "algo_ondemand_wifi": True,
+            "algo_ondemand_wifi_exclude": base64.b64encode(b"Home,Office").decode(),
+            "ipv6_support": True,
+            "reduce_mtu": 0,
+            "wireguard_dns_servers": "172.16.0.1",
+            "wireguard_PersistentKeepalive": 0,
+        },
+        "user_vars": {
+            "wireguard_client_ip": {
+                user: f"10.49.0.{host},2001:db8:a160::{host}" for host, user in enumerate(USERS, start=2)
+            },
+            "wireguard_port": dict.fromkeys(USERS, 51820),
+            "wireguard_server_public_key": dict.fromkeys(USERS, f"public-{SERVER}-key="),
+        },
+        "user_files": [
+            {"name": "wireguard_client_private_key", "path": f"{pki}/private/{{user}}", "base64": False},
+            {"name": "wireguard_client_preshared_key", "path": f"{pki}/preshared/{{user}}", "base64": False},
+        ],
+        "workers": 1,
+        "check_mode": False,
+    }
+
+
+def test_renders_wireguard_configs(wireguard, tmp_path):
+    """Client configs match what the per-user template tasks produced."""
+    result = client_configs.render_configs(wireguard)
+
+    assert result["changed"]
+    assert result["rendered"] == 6
+    assert len(result["changed_files"]) == 6
+
+    conf = (tmp_path / "wireguard" / "bob.conf").read_text()
+    assert "PrivateKey = private-bob-key=\n" in conf
+    assert "Address = 10.49.0.3,2001:db8:a160::3\n" in conf
+    assert f"PublicKey = public-{SERVER}-key=\n" in conf
+    assert "PresharedKey = preshared-bob-key=\n" in conf
+    assert f"Endpoint = {SERVER}:51820\n" in conf
+    assert stat.S_IMODE((tmp_path / "wireguard" / "bob.conf").stat().st_mode) == 0o600
+
+
+def test_wireguard_shards(wireguard, tmp_path):
+    """Users on other shards connect to the port and key of their interface."""
+    wireguard["user_vars"]["wireguard_port"]["bob"] = 51821
+    wireguard["user_vars"]["wireguard_server_public_key"]["bob"] = f"public-{SERVER}-wg1-key="
+
+    client_configs.render_configs(wireguard)
+
+    bob = (tmp_path / "wireguard" / "bob.conf").read_text()
+    assert f"PublicKey = public-{SERVER}-wg1-key=\n" in bob
+    assert f"Endpoint = {SERVER}:51821\n" in bob
+    assert f"Endpoint = {SERVER}:51820\n" in (tmp_path / "wireguard" / "carol.conf").read_text()
+
+
+def test_wireguard_mobileconfig(wireguard, tmp_path):
+    """The mobileconfig is a valid plist embedding the client config."""
+    client_configs.render_configs(wireguard)
+
+    profile = plistlib.loads((tmp_path / "wireguard" / "apple" / "ios" / "alice.mobileconfig").read_bytes())
+    vpn = profile["PayloadContent"][0]
+    assert vpn["VPNSubType"] == "com.wireguard.ios"
+    assert "PrivateKey = private-alice-key=" in vpn["VendorConfig"]["WgQuickConfig"]
+    assert "Address = 10.49.0.2,2001:db8:a160::2" in vpn["VendorConfig"]["WgQuickConfig"]
+    disconnect = vpn["VPN"]["OnDemandRules"][0]
+    assert disconnect["SSIDMatch"] == ["Home", "Office"]
+
+
+def test_idempotent(wireguard):
+    """A second run renders identical files and changes nothing."""
+    client_configs.render_configs(wireguard)
+
+    result = client_configs.render_configs(wireguard)
+
+    assert not result["changed"]
+    assert result["changed_files"] == []
+
+
+def test_only_changed_files_written(wireguard, tmp_path):
+    """Files whose content or mode is unchanged are left alone."""
+    client_configs.render_configs(wireguard)
+    (tmp_path / ".pki" / "preshared" / "bob").write_text("rotated=\n")
+    (tmp_path / "wireguard" / "carol.conf").chmod(0o644)
+
+    result = client_configs.render_configs(wireguard)
+
+    assert result["changed_files"] == [
+        str(tmp_path / "wireguard" / "bob.conf"),
+        str(tmp_path / "wireguard" / "apple" / "ios" / "bob.mobileconfig"),
+        str(tmp_path / "wireguard" / "carol.conf"),
+    ]
+    assert stat.S_IMODE((tmp_path / "wireguard" / "carol.conf").stat().st_mode) == 0o600
+
+
+def test_render_subset(wireguard, tmp_path):
+    """Rendering a subset of users only writes their files, with their own values."""
+    result = client_configs.render_configs(wireguard, render=["carol"])
+
+    assert result["rendered"] == 2
+    assert "Address = 10.49.0.4,2001:db8:a160::4" in (tmp_path / "wireguard" / "carol.conf").read_text()
+    assert not (tmp_path / "wireguard" / "alice.conf").exists()
+
+
+def test_check_mode_writes_nothing(wireguard, tmp_path):
+    wireguard["check_mode"] = True
+
+    result = client_configs.render_configs(wireguard)
+
+    assert result["changed"]
+    assert not (tmp_path / "wireguard").exists()
+
+
+def test_process_pool(wireguard, tmp_path):
+    """Rendering through the process pool produces the same files as the serial path."""
+    client_configs.render_configs(wireguard)
+    serial = {p: p.read_bytes() for p in (tmp_path / "wireguard").rglob("*.*")}
+    wireguard["workers"] = 3
+    for path in serial:
+        path.unlink()
+
+    result = client_configs.render_configs(wireguard)
+
+    assert len(result["changed_files"]) == 6
+    assert {p: p.read_bytes() for p in (tmp_path / "wireguard").rglob("*.*")} == serial
+
+
+@pytest.fixture
+def with_manifest(wireguard, tmp_path):
+    wireguard.update(manifest=str(tmp_path / ".manifest.json"), manifest_section="wireguard")
+    return wireguard
+
+
+def test_manifest_skips_up_to_date_users(with_manifest, tmp_path):
+    """A run where nothing changed renders nothing."""
+    client_configs.render_configs(with_manifest)
+
+    result = client_configs.render_configs(with_manifest)
+
+    assert not result["changed"]
+    assert result["rendered"] == 0
+    assert result["up_to_date"] == USERS
+
+
+def test_manifest_tracks_dependencies(with_manifest, tmp_path):
+    """Only users whose key files, outputs or inputs changed are rendered again."""
+    client_configs.render_configs(with_manifest)
+    (tmp_path / ".pki" / "preshared" / "bob").write_text("rotated=\n")
+    (tmp_path / "wireguard" / "carol.conf").unlink()
+
+    result = client_configs.render_configs(with_manifest)
+
+    assert result["up_to_date"] == ["alice"]
+    assert result["changed_files"] == [
+        str(tmp_path / "wireguard" / "bob.conf"),
+        str(tmp_path / "wireguard" / "apple" / "ios" / "bob.mobileconfig"),
+        str(tmp_path / "wireguard" / "carol.conf"),
+    ]
+
+    with_manifest["vars"]["wireguard_dns_servers"] = "172.16.0.2"
+    assert client_configs.render_configs(with_manifest)["up_to_date"] == []
+
+
+def test_manifest_adding_user_keeps_records(with_manifest, tmp_path):
+    """A new user is rendered alone; the records of the existing users still match."""
+    client_configs.render_configs(with_manifest)
+    (tmp_path / ".pki" / "private" / "dave").write_text("private-dave-key=\n")
+    (tmp_path / ".pki" / "preshared" / "dave").write_text("preshared-dave-key=\n")
+    with_manifest["users"] = [*USERS, "dave"]
+    for name, value in (
+        ("wireguard_client_ip", "10.49.0.5,2001:db8:a160::5"),
+        ("wireguard_port", 51820),
+        ("wireguard_server_public_key", f"public-{SERVER}-key="),
+    ):
+        with_manifest["user_vars"][name]["dave"] = value
+
+    result = client_configs.render_configs(with_manifest)
+
+    assert result["up_to_date"] == USERS
+    assert result["rendered"] == 2
+    assert "Address = 10.49.0.5,2001:db8:a160::5\n" in (tmp_path / "wireguard" / "dave.conf").read_text()
+
+
+def test_manifest_sections(with_manifest, tmp_path):
+    """Sections of other tasks are kept and removed users are dropped."""
+    client_configs.render_configs(with_manifest)
+    client_configs.render_configs({**with_manifest, "manifest_section": "other"})
+    client_configs.render_configs({**with_manifest, "users": ["alice", "carol"]})
+
+    manifest = json.loads((tmp_path / ".manifest.json").read_text())
+
+    assert sorted(manifest) == ["other", "wireguard"]
+    assert sorted(manifest["wireguard"]) == ["alice", "carol"]
+    assert sorted(manifest["other"]) == USERS
+    assert str(tmp_path / ".pki" / "private" / "alice") in manifest["wireguard"]["alice"]["deps"]
+
+
+@pytest.fixture
+def with_qr(wireguard, tmp_path):
+    wireguard["templates"][0]["qr"] = f"{tmp_path}/wireguard/{{user}}.png"
+    return wireguard
+
+
+def test_qr_codes(with_qr, tmp_path):
+    """QR codes encode the rendered client config, generated in-process."""
+    result = client_configs.render_configs(with_qr)
+
+    png = tmp_path / "wireguard" / "alice.png"
+    expected = io.BytesIO()
+    segno.make((tmp_path / "wireguard" / "alice.conf").read_text()).save(expected, kind="png", scale=5)
+    assert str(png) in result["changed_files"]
+    assert png.read_bytes() == expected.getvalue()
+    assert stat.S_IMODE(png.stat().st_mode) == 0o600
+
+
+def test_qr_codes_only_for_changed_configs(with_qr, tmp_path):
+    """PNGs are only regenerated when their config changed or the PNG is missing."""
+    client_configs.render_configs(with_qr)
+    alice = tmp_path / "wireguard" / "alice.png"
+    alice_before = alice.stat().st_mtime_ns
+    (tmp_path / ".pki" / "preshared" / "bob").write_text("rotated=\n")
+    (tmp_path / "wireguard" / "carol.png").unlink()
+
+    result = client_configs.render_configs(with_qr)
+
+    pngs = sorted(p for p in result["changed_files"] if p.endswith(".png"))
+    assert pngs == [str(tmp_path / "wireguard" / "bob.png"), str(tmp_path / "wireguard" / "carol.png")]
+    assert alice.stat().st_mtime_ns == alice_before
+
+
+def test_qr_codes_skipped_without_segno(with_qr, tmp_path, monkeypatch):
+    monkeypatch.setattr(client_configs, "HAS_SEGNO", False)
+
+    result = client_configs.render_configs(with_qr)
+
+    assert not list((tmp_path / "wireguard").glob("*.png"))
+    assert len(result["changed_files"]) == 6
+
+
+def strongswan_params(tmp_path):
+    pki = tmp_path / ".pki"
+    (pki / "private").mkdir(parents=True)
+    p12 = bytes(range(256)) * 4
+    (pki / "private" / "alice.p12").write_bytes(p12)
+    out = tmp_path / "ipsec"
+    params = {
+        "template_dirs": [str(ROLES_DIR / "strongswan" / "templates")],
+        "templates": [
+            {"src": "mobileconfig.j2", "dest": f"{out}/apple/{{user}}.mobileconfig", "mode": "0600", "vars": {}},
+            {"src": "client_ipsec.conf.j2", "dest": f"{out}/manual/{{user}}.conf", "mode": "0600", "vars": {}},
+            {"src": "client_ipsec.secrets.j2", "dest": f"{out}/manual/{{user}}.secrets", "mode": "0600", "vars": {}},
+        ],
+        "users": ["alice"],
+        "vars": {
+            "IP_subject_alt_name": SERVER,
+            "PayloadContentCA": base64.b64encode(b"CA").decode(),
+            "algo_server_name": "algo",
+            "algo_ondemand_cellular": False,
+            "algo_ondemand_wifi": False,
+            "algo_ondemand_wifi_exclude": base64.b64encode(b"_null").decode(),
+            "ciphers": {"defaults": {"ike": "aes256gcm16-prfsha512-ecp384!", "esp": "aes256gcm16-ecp384!"}},
+            "openssl_constraint_random_id": "uuid.algo",
+            "p12_export_password": "secret",
+        },
+        "user_vars": {},
+        "user_files": [{"name": "PayloadContentP12", "path": f"{pki}/private/{{user}}.p12", "base64": True}],
+        "workers": 1,
+        "check_mode": False,
+    }
+    return params, p12
+
+
+def test_strongswan_configs(tmp_path):
+    """The IPsec mobileconfig embeds the user's p12 bundle and the manual configs reference the user."""
+    params, p12 = strongswan_params(tmp_path)
+    out = tmp_path / "ipsec"
+
+    client_configs.render_configs(params)
+
+    profile = plistlib.loads((out / "apple" / "alice.mobileconfig").read_bytes())
+    vpn, bundle, ca = profile["PayloadContent"]
+    assert vpn["IKEv2"]["LocalIdentifier"] == "alice@uuid.algo"
+    assert bundle["PayloadContent"] == p12
+    assert bundle["PayloadCertificateFileName"] == "alice.p12"
+    assert vpn["IKEv2"]["PayloadCertificateUUID"] == bundle["PayloadUUID"]
+    assert ca["PayloadContent"] == b"CA"
+    assert "leftcert=alice.crt" in (out / "manual" / "alice.conf").read_text()
+    assert (out / "manual" / "alice.secrets").read_text() == f"{SERVER} : ECDSA alice.key\n"
+
+
+def test_manifest_untracked_vars(tmp_path):
+    """A new p12 password alone does not re-render; the p12 bundle rebuilt for it does."""
+    params, _ = strongswan_params(tmp_path)
+    params.update(
+        manifest=str(tmp_path / ".manifest.json"), manifest_section="ipsec", untracked_vars=["p12_export_password"]
+    )
+    client_configs.render_configs(params)
+
+    params["vars"] = {**params["vars"], "p12_export_password": "rotated"}
+    assert client_configs.render_configs(params)["up_to_date"] == ["alice"]
+
+    (tmp_path / ".pki" / "private" / "alice.p12").write_bytes(b"rebuilt")
+    result = client_configs.render_configs(params)
+
+    assert result["up_to_date"] == []
+    profile = plistlib.loads((tmp_path / "ipsec" / "apple" / "alice.mobileconfig").read_bytes())
+    assert profile["PayloadContent"][1]["Password"] == params["vars"]["p12_export_password"]
+
+
+def test_strongswan_mobileconfig_matches_ansible_template(tmp_path):
+    """The p12 bundle is wrapped like base64(1), which the template task embedded before."""
+    params, p12 = strongswan_params(tmp_path)
+
+    client_configs.render_configs(params)
+
+    mobileconfig = (tmp_path / "ipsec" / "apple" / "alice.mobileconfig").read_text()
+    assert base64.encodebytes(p12).decode().rstrip("\n") in mobileconfig
+    assert mobileconfig.startswith("<?xml")
+    uuid = ansible_filters.to_uuid(ansible_filters.rand(None, 900000, seed=SERVER + "alice")).upper()
+    assert f"<string>com.apple.security.pkcs12.{uuid}</string>" in mobileconfig
+
+
+def test_filters_match_ansible():
+    """The filters the templates use return what Ansible's own filters return."""
+    assert client_configs.to_uuid("10.0.0.1") == ansible_filters.to_uuid("10.0.0.1")
+    assert client_configs.rand(500000, seed="10.0.0.1alice") == ansible_filters.rand(None, 500000, seed="10.0.0.1alice")
+    assert client_configs.b64decode("SG9tZSxPZmZpY2U=") == ansible_filters.b64decode("SG9tZSxPZmZpY2U=")
+
+
+def test_jinja2_override_header(tmp_path):
+    """A "#jinja2:" first line configures the environment and is not rendered."""
+    (tmp_path / "t.j2").write_text("#jinja2:lstrip_blocks: True\n<a>\n    {% if true %}\n  x\n    {% endif %}\n</a>\n")
+    env = client_configs.create_environment([str(tmp_path)])
+
+    assert client_configs.render(client_configs.load_template(env, "t.j2"), {}) == "<a>\n  x\n</a>\n"
+
+
+def test_run_module_rejects_unknown_render_users(tmp_path, mock_ansible_module, monkeypatch):
+    module = mock_ansible_module(
+        {
+            "template_dirs": [str(tmp_path)],
+            "templates": [{"src": "t.j2", "dest": str(tmp_path / "{user}"), "mode": "0600", "vars": {}}],
+            "users": ["alice"],
+            "render": ["mallory"],
+            "vars": {},
+            "user_vars": {},
+            "user_files": [],
+            "workers": 0,
+        }
+    )
+    module.check_mode = False
+    monkeypatch.setattr(client_configs, "AnsibleModule", lambda **kwargs: module)
+
+    with pytest.raises(Exception, match="not in users"):
+        client_configs.run_module()
@@ -290,7 +290,7 @@ class TestComprehensiveBooleanScan:
         """Test that template files handle boolean variables correctly."""
         templates_to_check = [
             ("roles/wireguard/templates/server.conf.j2", "ipv6_support"),
-            ("roles/strongswan/templates/ipsec.conf.j2", "ipv6_support"),
+            ("roles/strongswan/templates/swanctl.conf.j2", "ipv6_support"),
             ("roles/dns/templates/dnscrypt-proxy.toml.j2", "ipv6_support"),
         ]
 
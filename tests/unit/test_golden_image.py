@@ -0,0 +1,55 @@
+"""Tests for the golden image support: bake.yml and the deploy-time detection."""
+
+from pathlib import Path
+
+import yaml
+from jinja2 import Environment
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def load_yaml(path):
+    with open(ROOT / path) as f:
+        return yaml.safe_load(f)
+
+
+def render_cloud_init(**variables):
+    template = Environment().from_string((ROOT / "files/cloud-init/base.yml").read_text())
+    return template.render(lookup=lambda *args, **kwargs: "", SSH_keys={"public": ""}, **variables)
+
+
+def test_cloud_init_upgrades_by_default():
+    rendered = render_cloud_init()
+
+    assert rendered.startswith("#cloud-config\n")
+    parsed = yaml.safe_load(rendered)
+    assert parsed["package_update"] is True
+    assert parsed["package_upgrade"] is True
+
+
+def test_cloud_init_prebaked_image():
+    """Servers created from a baked image do not upgrade the packages again."""
+    parsed = yaml.safe_load(render_cloud_init(prebaked_image=True))
+
+    assert parsed["package_update"] is False
+    assert parsed["package_upgrade"] is False
+    assert "sudo" in parsed["packages"]
+
+
+def test_bake_packages_cover_deploy_packages():
+    """Everything packages.yml installs is baked, otherwise baked deployments still run apt."""
+    bake_packages = set(load_yaml("roles/common/defaults/main.yml")["bake_packages"])
+    tasks = load_yaml("roles/common/tasks/ubuntu.yml")
+    tools = next(t["set_fact"]["tools"] for t in tasks if "tools" in t.get("set_fact", {}))
+
+    assert set(tools) <= bake_packages
+    assert {"strongswan", "strongswan-swanctl", "charon-systemd", "wireguard", "dnscrypt-proxy"} <= bake_packages
+
+
+def test_deploy_detects_baked_image():
+    """The upgrade and reboot are skipped on baked images."""
+    tasks = load_yaml("roles/common/tasks/ubuntu.yml")
+
+    assert tasks[1] == {"name": "Detect a golden image", "import_tasks": "baked.yml"}
+    cloud_only = next(t for t in tasks if t.get("name") == "Cloud only tasks")
+    assert "not algo_image_baked | bool" in cloud_only["when"]
@@ -252,5 +252,117 @@ def test_dns_firewall_restricted_to_vpn():
     assert "-A INPUT -d 172.23.198.242 -p udp --dport 53 -j ACCEPT" not in result
 
 
+def test_wireguard_shard_ports():
+    """All WireGuard shard ports are accepted as one multiport range."""
+    template = load_template("rules.v4.j2")
+
+    result = template.render(
+        ipsec_enabled=True,
+        wireguard_enabled=True,
+        strongswan_network="10.48.0.0/16",
+        wireguard_network_ipv4="10.49.0.0/16",
+        wireguard_port=51820,
+        wireguard_port_avoid=53,
+        wireguard_port_actual=51820,
+        wireguard_shards=4,
+        wireguard_port_last=51823,
+        ansible_default_ipv4={"interface": "eth0"},
+        snat_aipv4=None,
+        BetweenClients_DROP=True,
+        block_smb=True,
+        block_netbios=True,
+        local_service_ip="10.49.0.1",
+        ansible_ssh_port=22,
+        reduce_mtu=0,
+    )
+
+    assert "-A INPUT -p udp -m multiport --dports 500,4500,51820:51823 -j ACCEPT" in result
+
+
+@pytest.mark.parametrize("template_name", ["rules.v4.j2", "rules.v6.j2"])
+def test_notrack_vpn_transport(template_name):
+    """The encrypted VPN transport bypasses connection tracking in both directions."""
+    template = load_template(template_name)
+
+    result = template.render(
+        ipsec_enabled=True,
+        wireguard_enabled=True,
+        strongswan_network="10.48.0.0/16",
+        wireguard_network_ipv4="10.49.0.0/16",
+        strongswan_network_ipv6="2001:db8::/48",
+        wireguard_network_ipv6="2001:db8:a160::/48",
+        wireguard_port=51820,
+        wireguard_port_avoid=53,
+        wireguard_port_actual=51820,
+        wireguard_shards=2,
+        wireguard_port_last=51821,
+        firewall_notrack=True,
+        ansible_default_ipv4={"interface": "eth0"},
+        ansible_default_ipv6={"interface": "eth0"},
+        snat_aipv4=None,
+        alternative_ingress_ip=False,
+        BetweenClients_DROP=True,
+        block_smb=True,
+        block_netbios=True,
+        local_service_ip="10.49.0.1",
+        local_service_ipv6="fd00::1",
+        ansible_ssh_port=22,
+        reduce_mtu=0,
+    )
+
+    raw = result.split("*raw", 1)[1].split("COMMIT", 1)[0]
+    assert "-A PREROUTING -p udp -m multiport --dports 500,4500,51820:51821 -j CT --notrack" in raw
+    assert "-A OUTPUT -p udp -m multiport --sports 500,4500,51820:51821 -j CT --notrack" in raw
+
+
+def test_notrack_keeps_redirected_wireguard_tracked():
+    """WireGuard redirected from an already used port needs conntrack for the NAT."""
+    template = load_template("rules.v4.j2")
+
+    result = template.render(
+        ipsec_enabled=True,
+        wireguard_enabled=True,
+        strongswan_network="10.48.0.0/16",
+        wireguard_network_ipv4="10.49.0.0/16",
+        wireguard_port=53,
+        wireguard_port_avoid=53,
+        wireguard_port_actual=51820,
+        firewall_notrack=True,
+        ansible_default_ipv4={"interface": "eth0"},
+        snat_aipv4=None,
+        BetweenClients_DROP=True,
+        block_smb=True,
+        block_netbios=True,
+        local_service_ip="10.49.0.1",
+        ansible_ssh_port=22,
+        reduce_mtu=0,
+    )
+
+    assert "-A PREROUTING -p udp -m multiport --dports 500,4500 -j CT --notrack" in result
+
+
+def test_notrack_disabled_flushes_raw_table():
+    """Without the bypass the raw table is still restored, so earlier rules are removed."""
+    template = load_template("rules.v4.j2")
+
+    result = template.render(
+        ipsec_enabled=True,
+        wireguard_enabled=False,
+        strongswan_network="10.48.0.0/16",
+        firewall_notrack=False,
+        ansible_default_ipv4={"interface": "eth0"},
+        snat_aipv4=None,
+        BetweenClients_DROP=True,
+        block_smb=True,
+        block_netbios=True,
+        local_service_ip="10.48.0.1",
+        ansible_ssh_port=22,
+        reduce_mtu=0,
+    )
+
+    assert "*raw" in result
+    assert "--notrack" not in result
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -93,3 +93,88 @@ def test_cli_missing_dir():
         check=True,
     )
     assert json.loads(result.stdout) == []
+
+
+def test_index_written(configs_dir):
+    """The index records every config with its modification time and size."""
+    index = configs_dir / ".cache" / "servers.json"
+
+    servers = list_servers(configs_dir, index)
+
+    data = json.loads(index.read_text())
+    assert set(data["servers"]) == {"10.0.0.1/.config.yml", "10.0.0.2/.config.yml"}
+    assert [e["config"] for e in data["servers"].values()] == servers
+
+
+def test_index_incremental(configs_dir, monkeypatch):
+    """Only added or changed configs are parsed again, and removed ones are dropped."""
+    index = configs_dir / ".cache" / "servers.json"
+    list_servers(configs_dir, index)
+
+    parsed = []
+    load_config = _mod._load_config
+    monkeypatch.setattr(_mod, "_load_config", lambda path: parsed.append(path.parent.name) or load_config(path))
+
+    (configs_dir / "10.0.0.2" / ".config.yml").write_text(
+        "server: 10.0.0.2\nalgo_provider: ec2\nalgo_server_name: prod2\n"
+    )
+    (configs_dir / "10.0.0.1" / ".config.yml").unlink()
+    server3 = configs_dir / "10.0.0.3"
+    server3.mkdir()
+    (server3 / ".config.yml").write_text("server: 10.0.0.3\nalgo_server_name: new\n")
+
+    servers = list_servers(configs_dir, index)
+
+    assert sorted(parsed) == ["10.0.0.2", "10.0.0.3"]
+    assert [s["algo_server_name"] for s in servers] == ["prod2", "new"]
+    assert "10.0.0.1/.config.yml" not in json.loads(index.read_text())["servers"]
+
+    parsed.clear()
+    assert list_servers(configs_dir, index) == servers
+    assert parsed == []
+
+
+def test_corrupt_index_rebuilt(configs_dir):
+    index = configs_dir / ".cache" / "servers.json"
+    index.parent.mkdir()
+    index.write_text("{broken")
+
+    assert len(list_servers(configs_dir, index)) == 2
+    assert json.loads(index.read_text())["version"] == _mod.INDEX_VERSION
+
+
+def test_filter_servers(configs_dir):
+    servers = list_servers(configs_dir)
+
+    assert [s["server"] for s in _mod.filter_servers(servers, provider="ec2")] == ["10.0.0.2"]
+    assert [s["server"] for s in _mod.filter_servers(servers, name="al*")] == ["10.0.0.1"]
+    assert _mod.filter_servers(servers, provider="ec2", name="algo") == []
+    assert _mod.filter_servers(servers, provider=None, region=None) == servers
+
+
+def test_cli_filter(configs_dir):
+    """CLI filters the servers and keeps its index inside the configs directory."""
+    result = subprocess.run(
+        [sys.executable, "scripts/list_servers.py", str(configs_dir), "--provider", "digitalocean"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert [s["server"] for s in json.loads(result.stdout)] == ["10.0.0.1"]
+    assert (configs_dir / ".cache" / "servers.json").exists()
+
+
+def test_index_non_json_values(tmp_path, monkeypatch):
+    """Values JSON cannot represent come back the same from the index, which is not rewritten."""
+    server = tmp_path / "10.0.0.1"
+    server.mkdir()
+    (server / ".config.yml").write_text("server: 10.0.0.1\ndeployed: 2024-05-01\n")
+    index = tmp_path / ".cache" / "servers.json"
+
+    first = list_servers(tmp_path, index)
+    written = index.stat().st_mtime_ns
+    monkeypatch.setattr(_mod, "_write_index", lambda *args: pytest.fail("index rewritten"))
+
+    assert list_servers(tmp_path, index) == first == list_servers(tmp_path)
+    assert first[0]["deployed"] == "2024-05-01"
+    assert index.stat().st_mtime_ns == written
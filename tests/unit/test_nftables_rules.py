@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test the nftables ruleset template.
+
+These tests verify that rules.nft.j2 renders the policy of the iptables
+templates with sets for the VPN subnets and ports, and that the table is
+replaced as a whole.
+"""
+
+from pathlib import Path
+
+import pytest
+from jinja2 import Environment, FileSystemLoader
+
+
+def _ansible_bool(value):
+    """Simulate the Ansible bool filter for test purposes."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return value.lower() not in ("false", "no", "0", "")
+    return bool(value)
+
+
+def render(**overrides):
+    """Render rules.nft.j2 for a server with both VPNs enabled."""
+    template_dir = Path(__file__).parent.parent.parent / "roles" / "common" / "templates"
+    env = Environment(loader=FileSystemLoader(str(template_dir)), trim_blocks=True)
+    env.filters["bool"] = _ansible_bool
+    env.filters["ansible.utils.ipaddr"] = lambda value, query: value.split("/")[0]
+    variables = {
+        "ipsec_enabled": True,
+        "wireguard_enabled": True,
+        "strongswan_network": "10.48.0.0/16",
+        "wireguard_network_ipv4": "10.49.0.0/16",
+        "strongswan_network_ipv6": "2001:db8:4160::/48",
+        "wireguard_network_ipv6": "2001:db8:a160::/48",
+        "wireguard_port": 51820,
+        "wireguard_port_avoid": 53,
+        "wireguard_port_actual": 51820,
+        "ansible_default_ipv4": {"interface": "eth0"},
+        "ansible_default_ipv6": {"interface": "eth0"},
+        "snat_aipv4": None,
+        "alternative_ingress_ip": False,
+        "BetweenClients_DROP": True,
+        "block_smb": True,
+        "block_netbios": True,
+        "local_service_ip": "172.16.0.1",
+        "local_service_ipv6": "fd00::1",
+        "ansible_ssh_port": 22,
+        "reduce_mtu": 0,
+        "ipv6_support": True,
+        "firewall_notrack": False,
+    }
+    variables.update(overrides)
+    return env.get_template("rules.nft.j2").render(**variables)
+
+
+def test_table_replaced_atomically():
+    """The file declares, deletes and redefines the table, so nft -f replaces it in one transaction."""
+    lines = [line for line in render().splitlines() if line and not line.startswith("#")]
+
+    assert lines[:3] == ["table inet algo", "delete table inet algo", "table inet algo {"]
+    assert "flush ruleset" not in render()
+
+
+def test_vpn_sets():
+    """The VPN subnets and ports are set elements matched by single rules."""
+    result = render()
+
+    assert "elements = { 10.48.0.0/16, 10.49.0.0/16 }" in result
+    assert "elements = { 2001:db8:4160::/48, 2001:db8:a160::/48 }" in result
+    assert "elements = { 500, 4500, 51820 }" in result
+    assert "udp dport @vpn_ports accept" in result
+    assert "ip saddr @vpn_subnets_ipv4 ip daddr @vpn_subnets_ipv4 drop" in result
+    assert "ip saddr @vpn_subnets_ipv4 ip daddr 172.16.0.1 udp dport 53 accept" in result
+
+
+def test_wireguard_shard_ports():
+    """All WireGuard shard ports are a single interval of the port set."""
+    result = render(ipsec_enabled=False, wireguard_shards=4, wireguard_port_last=51823)
+
+    assert "elements = { 51820-51823 }" in result
+    assert "elements = { 10.49.0.0/16 }" in result
+
+
+def test_wireguard_port_avoid():
+    """WireGuard on port 53 is redirected to the actual port, which is accepted too."""
+    result = render(wireguard_port=53)
+
+    assert "elements = { 500, 4500, 53, 51820 }" in result
+    assert "ip saddr @vpn_subnets_ipv4 udp dport 53 return" in result
+    assert 'meta nfproto ipv4 iifname "eth0" udp dport 53 redirect to :51820' in result
+
+
+def test_nat_rules():
+    """The decrypted VPN traffic is masqueraded, or SNATed to the alternative ingress address."""
+    result = render()
+
+    assert 'ip saddr 10.48.0.0/16 oifname "eth0" masquerade' in result
+    assert 'ip saddr 10.49.0.0/16 oifname "eth0" masquerade' in result
+    assert 'ip6 saddr 2001:db8:a160::/48 oifname "eth0" masquerade' in result
+
+    result = render(snat_aipv4="192.0.2.10", alternative_ingress_ip=True, ipv6_egress_ip="2001:db8::10/128")
+
+    assert 'ip saddr 10.49.0.0/16 oifname "eth0" snat ip to 192.0.2.10' in result
+    assert 'ip6 saddr 2001:db8:a160::/48 oifname "eth0" snat ip6 to 2001:db8::10' in result
+
+
+def test_ipsec_forward_rule_has_policy_match():
+    """Only IPsec traffic is required to have been decrypted by the kernel."""
+    result = render()
+
+    assert "ct state new ip saddr 10.48.0.0/16 meta ipsec exists accept" in result
+    assert "ct state new ip saddr 10.49.0.0/16 accept" in result
+
+
+@pytest.mark.parametrize("block", [True, False])
+def test_forward_services(block):
+    """SMB and NETBIOS are looked up in verdict maps that follow block_smb and block_netbios."""
+    verdict = "drop" if block else "accept"
+    result = render(block_smb=block, block_netbios=block)
+
+    assert f"tcp . 445 : {verdict}," in result
+    assert f"udp . 138 : {verdict}," in result
+    assert "meta l4proto . th dport vmap @forward_services" in result
+    assert "meta l4proto . th sport vmap @forward_netbios" in result
+
+
+def test_without_ipv6():
+    """Without IPv6 support no IPv6 addresses are rendered and the IPv6 subnet set is empty."""
+    result = render(ipv6_support=False, ansible_default_ipv6={})
+
+    assert "2001:db8" not in result
+    assert "fd00::1" not in result
+    assert "icmpv6 type echo-request" not in result
+
+
+def test_reduce_mtu():
+    result = render(reduce_mtu=20)
+
+    assert "ip saddr 10.48.0.0/16 tcp flags & (syn | rst) == syn tcp option maxseg size set 1340" in result
+    assert "ip6 saddr 2001:db8:4160::/48 tcp flags & (syn | rst) == syn tcp option maxseg size set 1320" in result
+
+
+def test_notrack_vpn_transport():
+    """The encrypted VPN transport bypasses connection tracking in both directions."""
+    result = render(firewall_notrack=True, wireguard_shards=2, wireguard_port_last=51821)
+
+    assert "elements = { 500, 4500, 51820-51821 }" in result
+    assert "type filter hook prerouting priority raw; policy accept;" in result
+    assert "udp dport @notrack_ports notrack" in result
+    assert "udp sport @notrack_ports notrack" in result
+
+    assert "notrack" not in render()
@@ -331,37 +331,35 @@ def validate_client_certificates_config():
     with open(openssl_task_file) as f:
         content = f.read()
 
-    # Look for client certificate CSR section
-    client_csr_section = re.search(
-        r"Create CSRs for client certificates.*?register: client_csr_jobs", content, re.DOTALL
-    )
-    if not client_csr_section:
-        print("⚠ Could not find client certificate CSR section")
+    # Client certificates are issued in bulk by the strongswan_pki module
+    client_cert_section = re.search(r"Issue client certificates.*?register: client_certs", content, re.DOTALL)
+    if not client_cert_section:
+        print("⚠ Could not find client certificate section")
         return
 
-    client_section = client_csr_section.group(0)
+    client_section = client_cert_section.group(0)
+    assert "strongswan_pki:" in client_section, "Client certificates should be issued by the strongswan_pki module"
+
+    module_file = find_ansible_file("library/strongswan_pki.py")
+    with open(module_file) as f:
+        module_source = f.read()
 
     # Check client certificate configuration
     client_checks = [
-        ("clientAuth", "Client certificates should have clientAuth EKU"),
+        ("CLIENT_AUTH", "Client certificates should have clientAuth EKU"),
         ("1.3.6.1.5.5.7.3.17", "Client certificates should have IPsec End Entity EKU"),
-        ("digitalSignature", "Client certificates should have digital signature usage"),
-        ("keyEncipherment", "Client certificates should have key encipherment usage"),
-        ("email:", "Client certificates should have email SAN"),
+        ("digital_signature=True", "Client certificates should have digital signature usage"),
+        ("key_encipherment=True", "Client certificates should have key encipherment usage"),
+        ("RFC822Name", "Client certificates should have email SAN"),
     ]
 
     for check, message in client_checks:
-        assert check in client_section, f"Missing client certificate configuration: {message}"
+        assert check in module_source, f"Missing client certificate configuration: {message}"
 
     # Security check: Client certificates should NOT have serverAuth (Issue #153)
-    # Look for serverAuth in extended_key_usage section, not in comments
-    eku_lines = [
-        line
-        for line in client_section.split("\n")
-        if "extended_key_usage:" in line or (line.strip().startswith("- ") and "serverAuth" in line)
-    ]
-    has_server_auth = any("serverAuth" in line for line in eku_lines if line.strip().startswith("- "))
-    assert not has_server_auth, "Client certificates must NOT have serverAuth EKU to prevent server impersonation"
+    assert "SERVER_AUTH" not in module_source, (
+        "Client certificates must NOT have serverAuth EKU to prevent server impersonation"
+    )
 
     # Verify client certificates use unique email domains (Issue #153)
     assert "openssl_constraint_random_id" in client_section, (
@@ -431,18 +429,30 @@ def validate_pkcs12_files_config():
 
     # Check PKCS#12 generation configuration
     p12_checks = [
-        ("openssl_pkcs12", "PKCS#12 generation should be configured"),
+        ("strongswan_pki", "PKCS#12 generation should be configured"),
         ("encryption_level", "PKCS#12 encryption level should be configured"),
         ("compatibility2022", "PKCS#12 should use Apple-compatible encryption"),
-        ("friendly_name", "PKCS#12 should have friendly names"),
-        ("other_certificates", "PKCS#12 should include CA certificate for full chain"),
-        ("passphrase", "PKCS#12 files should be password protected"),
-        ('mode: "0600"', "PKCS#12 files should have secure permissions"),
+        ("p12_passphrase", "PKCS#12 files should be password protected"),
     ]
 
     for check, message in p12_checks:
         assert check in content, f"Missing PKCS#12 configuration: {message}"
 
+    # Friendly names, the CA chain and file permissions are set by the module
+    module_file = find_ansible_file("library/strongswan_pki.py")
+    with open(module_file) as f:
+        module_source = f.read()
+
+    module_checks = [
+        ("serialize_key_and_certificates", "PKCS#12 generation should be configured"),
+        ("user.encode()", "PKCS#12 should have friendly names"),
+        ('"_ca.p12"', "PKCS#12 should include CA certificate for full chain"),
+        ("0o600", "PKCS#12 files should have secure permissions"),
+    ]
+
+    for check, message in module_checks:
+        assert check in module_source, f"Missing PKCS#12 configuration: {message}"
+
     print("✓ PKCS#12 configuration has proper Apple device compatibility settings")
 
 
@@ -0,0 +1,155 @@
+"""Tests for the region catalog module (library/region_catalog.py) and scripts/refresh_regions.py."""
+
+import importlib.util
+import io
+import json
+import threading
+import time
+import urllib.error
+from pathlib import Path
+
+import pytest
+import region_catalog
+
+_script = Path(__file__).resolve().parents[2] / "scripts" / "refresh_regions.py"
+_spec = importlib.util.spec_from_file_location("refresh_regions", str(_script))
+refresh_regions = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(refresh_regions)
+
+REGIONS = [{"slug": "nyc3", "available": True}, {"slug": "ams3", "available": True}]
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Record the provider API calls instead of making them."""
+    calls = []
+
+    def fetch(credentials):
+        calls.append(credentials)
+        return {"regions": REGIONS}
+
+    monkeypatch.setitem(region_catalog.FETCHERS, "digitalocean", fetch)
+    return calls
+
+
+def test_fetch_and_cache(tmp_path, api):
+    """The first lookup fetches the regions and writes them to the cache."""
+    result = region_catalog.lookup("digitalocean", {"token": "t"}, str(tmp_path))
+
+    assert result["changed"]
+    assert not result["cached"]
+    assert result["regions"] == REGIONS
+    assert result["status"] == 200
+    assert api == [{"token": "t"}]
+    cache = json.loads((tmp_path / "regions-digitalocean.json").read_text())
+    assert cache["regions"] == REGIONS
+    assert "token" not in json.dumps(cache)
+
+
+def test_fresh_cache_used(tmp_path, api):
+    region_catalog.lookup("digitalocean", {"token": "t"}, str(tmp_path))
+
+    result = region_catalog.lookup("digitalocean", {"token": "t"}, str(tmp_path))
+
+    assert result["cached"]
+    assert not result["changed"]
+    assert result["regions"] == REGIONS
+    assert len(api) == 1
+
+
+def test_expired_cache_refetched(tmp_path, api):
+    path = tmp_path / "regions-digitalocean.json"
+    path.write_text(json.dumps({"fetched_at": int(time.time()) - 7200, "regions": []}))
+
+    result = region_catalog.lookup("digitalocean", {"token": "t"}, str(tmp_path), ttl=3600)
+
+    assert not result["cached"]
+    assert result["regions"] == REGIONS
+    assert len(api) == 1
+
+
+@pytest.mark.parametrize("content", ["{broken", json.dumps({"fetched_at": int(time.time()) + 3600, "regions": []})])
+def test_invalid_cache_refetched(tmp_path, api, content):
+    """A corrupt cache, or one from the future, is fetched again."""
+    (tmp_path / "regions-digitalocean.json").write_text(content)
+
+    result = region_catalog.lookup("digitalocean", {"token": "t"}, str(tmp_path))
+
+    assert not result["cached"]
+    assert result["regions"] == REGIONS
+
+
+def test_ttl_zero_disables_cache(tmp_path, api):
+    region_catalog.lookup("digitalocean", {"token": "t"}, str(tmp_path), ttl=0)
+    result = region_catalog.lookup("digitalocean", {"token": "t"}, str(tmp_path), ttl=0)
+
+    assert not result["cached"]
+    assert len(api) == 2
+    assert not (tmp_path / "regions-digitalocean.json").exists()
+
+
+def test_scope_and_check_mode(tmp_path, monkeypatch):
+    monkeypatch.setitem(region_catalog.FETCHERS, "gce", lambda c: {"regions": REGIONS, "zones": [{"name": "a"}]})
+
+    result = region_catalog.lookup("gce", {}, str(tmp_path), scope="project", check_mode=True)
+
+    assert result["zones"] == [{"name": "a"}]
+    assert not list(tmp_path.iterdir())
+
+    region_catalog.lookup("gce", {}, str(tmp_path), scope="project")
+
+    assert (tmp_path / "regions-gce-project.json").exists()
+
+
+def test_http_error_status(monkeypatch):
+    """HTTP errors keep their status, so the prompts can explain them."""
+
+    def urlopen(request, timeout):
+        raise urllib.error.HTTPError(request.full_url, 401, "Unauthorized", {}, io.BytesIO())
+
+    monkeypatch.setattr(region_catalog.urllib.request, "urlopen", urlopen)
+
+    with pytest.raises(region_catalog.CatalogError) as e:
+        region_catalog.fetch_digitalocean({"token": "t"})
+
+    assert e.value.status == 401
+
+
+def test_refresh_all_concurrent(tmp_path, monkeypatch):
+    """All providers are fetched at the same time, and a failing one does not stop the others."""
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fetch(credentials):
+        barrier.wait()
+        if credentials.get("fail"):
+            raise region_catalog.CatalogError("boom", 500)
+        return {"regions": REGIONS}
+
+    for provider in ("digitalocean", "linode", "vultr"):
+        monkeypatch.setitem(region_catalog.FETCHERS, provider, fetch)
+    (tmp_path / "regions-linode.json").write_text(json.dumps({"fetched_at": int(time.time()), "regions": []}))
+
+    results = region_catalog.refresh_all(str(tmp_path), {"digitalocean": {}, "linode": {}, "vultr": {"fail": True}})
+
+    assert results["digitalocean"] == 2
+    assert results["linode"] == 2
+    assert isinstance(results["vultr"], region_catalog.CatalogError)
+    assert json.loads((tmp_path / "regions-linode.json").read_text())["regions"] == REGIONS
+
+
+def test_configured_providers(tmp_path):
+    vultr = tmp_path / "vultr.ini"
+    vultr.write_text("[default]\nkey = vultr-key\n")
+    gce = tmp_path / "gce.json"
+    gce.write_text(json.dumps({"project_id": "algo-project"}))
+
+    credentials, scopes = refresh_regions.configured_providers(
+        {"DO_API_TOKEN": "do-token", "VULTR_API_CONFIG": str(vultr), "GCE_CREDENTIALS_FILE_PATH": str(gce)}
+    )
+
+    assert credentials == {
+        "digitalocean": {"token": "do-token"},
+        "vultr": {"api_key": "vultr-key"},
+        "gce": {"service_account_file": str(gce), "project": "algo-project"},
+    }
+    assert scopes == {"gce": "algo-project"}
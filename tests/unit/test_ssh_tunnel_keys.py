@@ -0,0 +1,84 @@
+"""Tests for the batch SSH tunnel key module (library/ssh_tunnel_keys.py)."""
+
+import stat
+
+import pytest
+import ssh_tunnel_keys
+from cryptography.hazmat.primitives import serialization
+
+PASSPHRASE = "p12-secret"  # noqa: S105
+NEW_PASSPHRASE = "p12-secret-2"  # noqa: S105
+USERS = ["alice", "bob"]
+
+
+def make_params(path, **overrides):
+    params = {"path": str(path), "passphrase": PASSPHRASE, "key_size": 1024, "workers": 1, "check_mode": False}
+    params.update(overrides)
+    return params
+
+
+def test_generates_key_pairs(tmp_path):
+    """Every user gets an encrypted private key and the matching OpenSSH public key."""
+    result = ssh_tunnel_keys.generate_keys(make_params(tmp_path), USERS)
+
+    assert result["changed"]
+    assert result["created"] == USERS
+    for user in USERS:
+        pem = (tmp_path / f"{user}.pem").read_bytes()
+        assert b"ENCRYPTED" in pem
+        key = serialization.load_pem_private_key(pem, password=PASSPHRASE.encode())
+        public_key = key.public_key().public_bytes(serialization.Encoding.OpenSSH, serialization.PublicFormat.OpenSSH)
+        assert (tmp_path / f"{user}.pub").read_bytes() == public_key
+        assert result["public_keys"][user] == public_key.decode()
+        assert stat.S_IMODE((tmp_path / f"{user}.pem").stat().st_mode) == 0o600
+
+
+def test_idempotent(tmp_path):
+    """A second run keeps the keys and changes nothing."""
+    first = ssh_tunnel_keys.generate_keys(make_params(tmp_path), USERS)
+    second = ssh_tunnel_keys.generate_keys(make_params(tmp_path), USERS)
+
+    assert not second["changed"]
+    assert second["created"] == []
+    assert second["public_keys"] == first["public_keys"]
+
+
+def test_new_passphrase_keeps_existing_keys(tmp_path):
+    """p12_export_password is random per run: existing keys are kept without decrypting them."""
+    first = ssh_tunnel_keys.generate_keys(make_params(tmp_path), ["alice"])
+    pem = (tmp_path / "alice.pem").read_bytes()
+
+    second = ssh_tunnel_keys.generate_keys(make_params(tmp_path, passphrase=NEW_PASSPHRASE), ["alice", "bob"])
+
+    assert second["created"] == ["bob"]
+    assert second["public_keys"]["alice"] == first["public_keys"]["alice"]
+    assert (tmp_path / "alice.pem").read_bytes() == pem
+    serialization.load_pem_private_key((tmp_path / "bob.pem").read_bytes(), password=NEW_PASSPHRASE.encode())
+
+
+def test_missing_public_key(tmp_path):
+    """The public key of an existing private key cannot be derived without its passphrase."""
+    ssh_tunnel_keys.generate_keys(make_params(tmp_path), ["alice"])
+    (tmp_path / "alice.pub").unlink()
+
+    with pytest.raises(ValueError, match=r"alice\.pub is missing"):
+        ssh_tunnel_keys.generate_keys(make_params(tmp_path), ["alice"])
+
+
+def test_parallel_workers(tmp_path):
+    """Keys generated in a process pool end up on disk like serial ones."""
+    users = [f"user{i}" for i in range(4)]
+    result = ssh_tunnel_keys.generate_keys(make_params(tmp_path, workers=2), users)
+
+    assert result["created"] == users
+    assert sorted(p.name for p in tmp_path.glob("*.pub")) == sorted(f"{u}.pub" for u in users)
+
+
+def test_check_mode(tmp_path):
+    """Check mode reports new keys without writing them."""
+    path = tmp_path / "ssh-tunnel"
+    result = ssh_tunnel_keys.generate_keys(make_params(path, check_mode=True), ["alice"])
+
+    assert result["changed"]
+    assert result["created"] == ["alice"]
+    assert not path.exists()
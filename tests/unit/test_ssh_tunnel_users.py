@@ -0,0 +1,125 @@
+"""Tests for the SSH tunnel account module (library/ssh_tunnel_users.py)."""
+
+import grp
+import os
+import pwd
+import stat
+
+import pytest
+import ssh_tunnel_users
+
+KEY = "ssh-rsa AAAAB3NzaC1yc2EAAAADAQABAAABAQC0 alice"
+
+
+class FakeModule:
+    """Records commands instead of running them."""
+
+    def __init__(self, check_mode=False):
+        self.check_mode = check_mode
+        self.commands = []
+
+    def run_command(self, args, check_rc=False):
+        self.commands.append(args)
+        return 0, "", ""
+
+
+@pytest.fixture
+def accounts(monkeypatch):
+    """Fake passwd and algo group databases with accounts owned by the test user."""
+    uid, gid = os.getuid(), os.getgid()
+    passwd = {}
+
+    def add(name, home, shell="/bin/false"):
+        passwd[name] = pwd.struct_passwd((name, "x", uid, gid, "", str(home), shell))
+        return passwd[name]
+
+    monkeypatch.setattr(ssh_tunnel_users.pwd, "getpwnam", lambda name: passwd[name])
+    monkeypatch.setattr(ssh_tunnel_users.pwd, "getpwall", lambda: list(passwd.values()))
+    monkeypatch.setattr(ssh_tunnel_users.grp, "getgrnam", lambda name: grp.struct_group((name, "x", gid, [])))
+    return add
+
+
+def reconcile(module, users, tmp_path):
+    return ssh_tunnel_users.reconcile_users(module, users, "algo", str(tmp_path), "/bin/false")
+
+
+def test_creates_missing_users(accounts, tmp_path):
+    """Missing accounts are created with useradd in the jail."""
+    module = FakeModule()
+
+    def useradd(args, check_rc=False):
+        module.commands.append(args)
+        (tmp_path / "alice").mkdir()
+        accounts("alice", tmp_path / "alice")
+        return 0, "", ""
+
+    module.run_command = useradd
+    result = reconcile(module, {"alice": KEY}, tmp_path)
+
+    assert result["created"] == ["alice"]
+    assert module.commands == [
+        [
+            "useradd",
+            "--gid",
+            "algo",
+            "--groups",
+            "algo",
+            "--shell",
+            "/bin/false",
+            "--home-dir",
+            str(tmp_path / "alice"),
+            "--create-home",
+            "alice",
+        ]
+    ]
+    assert (tmp_path / "alice" / ".ssh" / "authorized_keys").read_text() == KEY + "\n"
+
+
+def test_existing_users_untouched(accounts, tmp_path):
+    """Accounts in the desired state cost no commands and report no change."""
+    (tmp_path / "alice").mkdir()
+    ssh_tunnel_users.ensure_authorized_key(accounts("alice", tmp_path / "alice"), KEY, False)
+    module = FakeModule()
+
+    result = reconcile(module, {"alice": KEY}, tmp_path)
+
+    assert not result["changed"]
+    assert module.commands == []
+
+
+def test_removes_stale_users(accounts, tmp_path):
+    """Group members that are no longer in the user list are deleted."""
+    accounts("mallory", tmp_path / "mallory")
+    module = FakeModule()
+
+    result = reconcile(module, {}, tmp_path)
+
+    assert result["changed"]
+    assert result["removed"] == ["mallory"]
+    assert module.commands == [["userdel", "--remove", "--force", "mallory"]]
+
+
+def test_authorized_key_replaced(accounts, tmp_path):
+    """Other keys are dropped from authorized_keys, leaving only the user's key."""
+    (tmp_path / "alice" / ".ssh").mkdir(parents=True)
+    (tmp_path / "alice" / ".ssh" / "authorized_keys").write_text("ssh-ed25519 AAAA other\n" + KEY + "\n")
+    account = accounts("alice", tmp_path / "alice")
+
+    assert ssh_tunnel_users.ensure_authorized_key(account, KEY, False)
+
+    path = tmp_path / "alice" / ".ssh" / "authorized_keys"
+    assert path.read_text() == KEY + "\n"
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+    assert stat.S_IMODE(path.parent.stat().st_mode) == 0o700
+
+
+def test_check_mode(accounts, tmp_path):
+    """Check mode reports the changes without running commands."""
+    accounts("mallory", tmp_path / "mallory")
+    module = FakeModule(check_mode=True)
+
+    result = reconcile(module, {"alice": KEY}, tmp_path)
+
+    assert result["created"] == ["alice"]
+    assert result["removed"] == ["mallory"]
+    assert module.commands == []
@@ -0,0 +1,134 @@
+"""Tests for the strongSwan CRL module (library/strongswan_crl.py)."""
+
+import json
+
+import pytest
+import strongswan_crl
+import strongswan_pki
+from cryptography import x509
+from test_strongswan_pki import CA_PASSWORD, make_ca, make_params
+
+USERS = ["alice", "bob", "carol", "dave"]
+
+
+@pytest.fixture
+def pki(tmp_path):
+    """A CA with certificates for all users."""
+    pki_path = tmp_path / ".pki"
+    ca_cert = make_ca(pki_path)
+    strongswan_pki.issue_certificates(make_params(pki_path), USERS)
+    return pki_path, ca_cert
+
+
+def load_crl(path):
+    return x509.load_pem_x509_crl(path.read_bytes())
+
+
+def serial(pki_path, user):
+    return x509.load_pem_x509_certificate((pki_path / "certs" / f"{user}.crt").read_bytes()).serial_number
+
+
+def update(pki_path, revoke, **kwargs):
+    return strongswan_crl.update_crls(str(pki_path), revoke, CA_PASSWORD, **kwargs)
+
+
+def test_base_crl(pki):
+    """The first run writes a signed base CRL listing the revoked certificates."""
+    pki_path, ca_cert = pki
+    result = update(pki_path, ["alice"])
+
+    assert result["changed"]
+    assert result["full"]
+    assert result["crls"] == ["crl.pem"]
+    crl = load_crl(pki_path / "crl.pem")
+    assert crl.issuer == ca_cert.subject
+    assert crl.is_signature_valid(ca_cert.public_key())
+    assert [r.serial_number for r in crl] == [serial(pki_path, "alice")]
+    assert crl.extensions.get_extension_for_class(x509.CRLNumber).value.crl_number == 1
+
+
+def test_unchanged_revocations_sign_nothing(pki):
+    """Without new revocations the CRLs are left alone."""
+    pki_path, _ = pki
+    update(pki_path, ["alice"])
+    before = (pki_path / "crl.pem").read_bytes()
+
+    result = update(pki_path, ["alice"])
+
+    assert not result["changed"]
+    assert result["crls"] == ["crl.pem"]
+    assert (pki_path / "crl.pem").read_bytes() == before
+
+
+def test_delta_crl(pki):
+    """New revocations go to a delta CRL that refers to the unchanged base CRL."""
+    pki_path, ca_cert = pki
+    update(pki_path, ["alice"])
+    base = (pki_path / "crl.pem").read_bytes()
+    # Revoked certificates are not read again once they are in the index
+    (pki_path / "certs" / "alice.crt").unlink()
+
+    result = update(pki_path, ["alice", "bob"])
+
+    assert not result["full"]
+    assert result["revoked"] == ["bob"]
+    assert result["crls"] == ["crl.pem", "crl-delta.pem"]
+    assert (pki_path / "crl.pem").read_bytes() == base
+    delta = load_crl(pki_path / "crl-delta.pem")
+    assert delta.is_signature_valid(ca_cert.public_key())
+    assert [r.serial_number for r in delta] == [serial(pki_path, "bob")]
+    assert delta.extensions.get_extension_for_class(x509.DeltaCRLIndicator).value.crl_number == 1
+    assert delta.extensions.get_extension_for_class(x509.CRLNumber).value.crl_number == 2
+
+
+def test_delta_threshold_rebuilds_base(pki):
+    """A delta CRL growing beyond the threshold is folded into a new base CRL."""
+    pki_path, _ = pki
+    update(pki_path, ["alice"], delta_threshold=1)
+    update(pki_path, ["alice", "bob"], delta_threshold=1)
+
+    result = update(pki_path, ["alice", "bob", "carol"], delta_threshold=1)
+
+    assert result["full"]
+    assert result["crls"] == ["crl.pem"]
+    crl = load_crl(pki_path / "crl.pem")
+    assert sorted(r.serial_number for r in crl) == sorted(serial(pki_path, u) for u in ("alice", "bob", "carol"))
+    assert crl.extensions.get_extension_for_class(x509.CRLNumber).value.crl_number == 3
+    index = json.loads((pki_path / "revoked.json").read_text())
+    assert index["base_crl_number"] == 3
+    assert index["delta"] == []
+
+
+def test_restored_user_rebuilds_base(pki):
+    """A revoked user that is added back is dropped from the CRLs."""
+    pki_path, _ = pki
+    update(pki_path, ["alice"])
+    update(pki_path, ["alice", "bob"])
+
+    result = update(pki_path, ["bob"])
+
+    assert result["restored"] == ["alice"]
+    assert result["full"]
+    assert [r.serial_number for r in load_crl(pki_path / "crl.pem")] == [serial(pki_path, "bob")]
+    assert not (pki_path / "crl-delta.pem").exists()
+
+
+def test_legacy_crl_replaced(pki):
+    """A CRL written before the revocation index existed is replaced by a base CRL."""
+    pki_path, _ = pki
+    (pki_path / "crl.pem").write_text("legacy")
+
+    result = update(pki_path, ["alice"])
+
+    assert result["full"]
+    assert [r.serial_number for r in load_crl(pki_path / "crl.pem")] == [serial(pki_path, "alice")]
+
+
+def test_check_mode(pki):
+    pki_path, _ = pki
+
+    result = update(pki_path, ["alice"], check_mode=True)
+
+    assert result["changed"]
+    assert not (pki_path / "crl.pem").exists()
+    assert not (pki_path / "revoked.json").exists()
@@ -0,0 +1,221 @@
+"""Tests for the batch strongSwan certificate module (library/strongswan_pki.py)."""
+
+import datetime
+import stat
+
+import pytest
+import strongswan_pki
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.hazmat.primitives.serialization import pkcs12
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+CA_PASSWORD = "ca-secret"  # noqa: S105
+P12_PASSWORD = "p12-secret"  # noqa: S105
+NEW_P12_PASSWORD = "p12-secret-2"  # noqa: S105
+EMAIL_DOMAIN = "12345678-1234-5678-1234-567812345678.algo"
+
+
+def make_ca(pki_path, cn="10.0.0.1"):
+    """Create an encrypted CA key and self-signed certificate like openssl.yml does."""
+    (pki_path / "private").mkdir(parents=True, exist_ok=True)
+    key = ec.generate_private_key(ec.SECP384R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, cn)])
+    now = datetime.datetime.now(datetime.UTC)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=30))
+        .add_extension(x509.BasicConstraints(ca=True, path_length=0), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    (pki_path / "private" / "cakey.pem").write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.BestAvailableEncryption(CA_PASSWORD.encode()),
+        )
+    )
+    (pki_path / "cacert.pem").write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    return cert
+
+
+def make_params(pki_path, **overrides):
+    params = {
+        "pki_path": str(pki_path),
+        "ca_passphrase": CA_PASSWORD,
+        "p12_passphrase": P12_PASSWORD,
+        "email_domain": EMAIL_DOMAIN,
+        "validity_days": 3650,
+        "encryption_level": "compatibility2022",
+        "manual_path": None,
+        "workers": 1,
+        "check_mode": False,
+    }
+    params.update(overrides)
+    return params
+
+
+@pytest.fixture
+def pki(tmp_path):
+    pki_path = tmp_path / ".pki"
+    ca_cert = make_ca(pki_path)
+    return pki_path, ca_cert
+
+
+def load_cert(pki_path, user):
+    return x509.load_pem_x509_certificate((pki_path / "certs" / f"{user}.crt").read_bytes())
+
+
+def test_issues_client_certificates(pki):
+    """Client certificates carry the same extensions as the former CSR tasks."""
+    pki_path, ca_cert = pki
+    result = strongswan_pki.issue_certificates(make_params(pki_path), ["alice", "bob"])
+
+    assert result["changed"]
+    assert result["issued"] == ["alice", "bob"]
+
+    cert = load_cert(pki_path, "alice")
+    assert cert.subject.get_attributes_for_oid(NameOID.COMMON_NAME)[0].value == "alice"
+    assert cert.issuer == ca_cert.subject
+    ca_cert.public_key().verify(cert.signature, cert.tbs_certificate_bytes, ec.ECDSA(cert.signature_hash_algorithm))
+
+    san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+    assert san.get_values_for_type(x509.RFC822Name) == [f"alice@{EMAIL_DOMAIN}"]
+    assert cert.extensions.get_extension_for_class(x509.BasicConstraints).value.ca is False
+    key_usage = cert.extensions.get_extension_for_class(x509.KeyUsage).value
+    assert key_usage.digital_signature
+    assert key_usage.key_encipherment
+    eku = cert.extensions.get_extension_for_class(x509.ExtendedKeyUsage).value
+    assert ExtendedKeyUsageOID.CLIENT_AUTH in eku
+    assert x509.ObjectIdentifier("1.3.6.1.5.5.7.3.17") in eku
+    assert ExtendedKeyUsageOID.SERVER_AUTH not in eku
+
+    key = serialization.load_pem_private_key((pki_path / "private" / "alice.key").read_bytes(), password=None)
+    assert isinstance(key.curve, ec.SECP384R1)
+    assert stat.S_IMODE((pki_path / "private" / "alice.key").stat().st_mode) == 0o600
+    assert (pki_path / "public" / "alice.pub").read_text().startswith("ecdsa-sha2-nistp384 ")
+
+
+def test_p12_bundles(pki, tmp_path):
+    """Both p12 bundles are password protected and only the _ca variant includes the CA."""
+    pki_path, ca_cert = pki
+    manual = tmp_path / "manual"
+    strongswan_pki.issue_certificates(make_params(pki_path, manual_path=str(manual)), ["alice"])
+
+    plain = pkcs12.load_pkcs12((pki_path / "private" / "alice.p12").read_bytes(), P12_PASSWORD.encode())
+    with_ca = pkcs12.load_pkcs12((pki_path / "private" / "alice_ca.p12").read_bytes(), P12_PASSWORD.encode())
+
+    assert plain.cert.friendly_name == b"alice"
+    assert plain.cert.certificate == load_cert(pki_path, "alice")
+    assert plain.additional_certs == []
+    assert [c.certificate for c in with_ca.additional_certs] == [ca_cert]
+    assert (manual / "alice.p12").read_bytes() == (pki_path / "private" / "alice.p12").read_bytes()
+    assert stat.S_IMODE((pki_path / "private" / "alice_ca.p12").stat().st_mode) == 0o600
+
+
+def test_idempotent(pki):
+    """A second run leaves keys, certificates and bundles untouched."""
+    pki_path, _ = pki
+    strongswan_pki.issue_certificates(make_params(pki_path), ["alice"])
+    before = {p.name: p.read_bytes() for p in pki_path.rglob("alice*")}
+
+    result = strongswan_pki.issue_certificates(make_params(pki_path), ["alice"])
+
+    assert not result["changed"]
+    assert result["issued"] == []
+    assert {p.name: p.read_bytes() for p in pki_path.rglob("alice*")} == before
+
+
+def test_p12_rebuilt_for_new_passphrase(pki, tmp_path):
+    """p12_export_password is random per run: the bundles are rebuilt so the profiles can open them."""
+    pki_path, _ = pki
+    manual = tmp_path / "manual"
+    strongswan_pki.issue_certificates(make_params(pki_path, manual_path=str(manual)), ["alice"])
+    cert = (pki_path / "certs" / "alice.crt").read_bytes()
+
+    result = strongswan_pki.issue_certificates(
+        make_params(pki_path, manual_path=str(manual), p12_passphrase=NEW_P12_PASSWORD), ["alice"]
+    )
+
+    assert result["changed"]
+    assert result["issued"] == []
+    assert (pki_path / "certs" / "alice.crt").read_bytes() == cert
+    for path in (pki_path / "private" / "alice.p12", pki_path / "private" / "alice_ca.p12", manual / "alice.p12"):
+        bundle = pkcs12.load_pkcs12(path.read_bytes(), NEW_P12_PASSWORD.encode())
+        assert bundle.cert.certificate == load_cert(pki_path, "alice")
+
+
+def test_only_new_users_issued(pki):
+    """Adding a user issues a certificate for that user only."""
+    pki_path, _ = pki
+    strongswan_pki.issue_certificates(make_params(pki_path), ["alice"])
+    alice_cert = (pki_path / "certs" / "alice.crt").read_bytes()
+
+    result = strongswan_pki.issue_certificates(make_params(pki_path), ["alice", "carol"])
+
+    assert result["issued"] == ["carol"]
+    assert (pki_path / "certs" / "alice.crt").read_bytes() == alice_cert
+
+
+def test_reissues_when_ca_changes(pki):
+    """Certificates signed by a previous CA are re-issued, keeping the private key."""
+    pki_path, _ = pki
+    strongswan_pki.issue_certificates(make_params(pki_path), ["alice"])
+    alice_key = (pki_path / "private" / "alice.key").read_bytes()
+    new_ca = make_ca(pki_path, cn="10.0.0.2")
+
+    result = strongswan_pki.issue_certificates(make_params(pki_path), ["alice"])
+
+    assert result["issued"] == ["alice"]
+    assert load_cert(pki_path, "alice").issuer == new_ca.subject
+    assert (pki_path / "private" / "alice.key").read_bytes() == alice_key
+
+
+def test_reissues_certificate_without_cn(pki):
+    """A certificate whose subject has no common name is re-issued instead of failing the run."""
+    pki_path, ca_cert = pki
+    strongswan_pki.issue_certificates(make_params(pki_path), ["alice"])
+    ca_key = serialization.load_pem_private_key((pki_path / "private" / "cakey.pem").read_bytes(), CA_PASSWORD.encode())
+    alice_key = serialization.load_pem_private_key((pki_path / "private" / "alice.key").read_bytes(), None)
+    now = datetime.datetime.now(datetime.UTC)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(x509.Name([x509.NameAttribute(NameOID.ORGANIZATION_NAME, "alice")]))
+        .issuer_name(ca_cert.subject)
+        .public_key(alice_key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=30))
+        .sign(ca_key, hashes.SHA256())
+    )
+    (pki_path / "certs" / "alice.crt").write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+
+    result = strongswan_pki.issue_certificates(make_params(pki_path), ["alice"])
+
+    assert result["issued"] == ["alice"]
+    assert load_cert(pki_path, "alice").subject.get_attributes_for_oid(NameOID.COMMON_NAME)[0].value == "alice"
+
+
+def test_process_pool(pki):
+    """Issuing through the process pool produces the same files as the serial path."""
+    pki_path, _ = pki
+    users = [f"user{i}" for i in range(6)]
+
+    result = strongswan_pki.issue_certificates(make_params(pki_path, workers=3), users)
+
+    assert result["issued"] == users
+    for user in users:
+        assert load_cert(pki_path, user).subject.rfc4514_string() == f"CN={user}"
+
+
+def test_worker_count():
+    """The pool never has more workers than users."""
+    assert strongswan_pki.worker_count(8, 3) == 3
+    assert strongswan_pki.worker_count(2, 100) == 2
+    assert strongswan_pki.worker_count(4, 0) == 1
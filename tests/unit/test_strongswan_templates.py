@@ -79,6 +79,17 @@ def get_strongswan_test_variables(scenario="default"):
         "leftsourceip": "10.19.48.1",
         "leftsubnet": "0.0.0.0/0,::/0",
         "rightsourceip": "10.19.48.2/24,fd9d:bc11:4021::2/64",
+        "strongswan_charon": {
+            "profile": "medium",
+            "threads": 32,
+            "priority_threads_high": 2,
+            "ikesa_table_size": 1024,
+            "ikesa_table_segments": 16,
+            "half_open_timeout": 5,
+            "dos_protection": True,
+            "cookie_threshold": 50,
+            "init_limit_half_open": 1000,
+        },
     }
 
     # Merge with base variables
@@ -102,8 +113,7 @@ def get_strongswan_test_variables(scenario="default"):
 def test_strongswan_templates():
     """Test all StrongSwan templates with various configurations."""
     templates = [
-        "roles/strongswan/templates/ipsec.conf.j2",
-        "roles/strongswan/templates/ipsec.secrets.j2",
+        "roles/strongswan/templates/swanctl.conf.j2",
         "roles/strongswan/templates/strongswan.conf.j2",
         "roles/strongswan/templates/charon.conf.j2",
         "roles/strongswan/templates/client_ipsec.conf.j2",
@@ -148,17 +158,21 @@ def test_strongswan_templates():
                 assert len(output) > 0, f"Empty output from {template_path} ({scenario})"
 
                 # Specific validations based on template
-                if "ipsec.conf" in template_name and "client" not in template_name:
-                    assert "conn" in output, "Missing connection definition"
+                if "swanctl.conf" in template_name:
+                    assert "connections {" in output, "Missing connection definition"
+                    assert "pools {" in output, "Missing address pools"
+                    assert "!" not in output, "swanctl proposals do not take the strict flag"
                     if scenario != "ipv4_only" and test_vars.get("ipv6_support"):
                         assert "::/0" in output or "fd9d:bc11" in output, "Missing IPv6 configuration"
 
-                if "ipsec.secrets" in template_name:
-                    assert "PSK" in output or "ECDSA" in output, "Missing authentication method"
-
                 if "strongswan.conf" in template_name:
                     assert "charon" in output, "Missing charon configuration"
 
+                if "charon.conf" in template_name:
+                    assert "threads = 32" in output, "Missing worker thread count"
+                    assert "ikesa_table_size = 1024" in output, "Missing IKE SA table size"
+                    assert "dos_protection = yes" in output, "Missing DoS protection"
+
                 print(f"  ✅ {template_name} ({scenario})")
 
             except Exception as e:
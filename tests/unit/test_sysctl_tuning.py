@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test the network sysctl drop-in and the sizing of its settings.
+
+The sizing expressions in roles/common/defaults/main.yml are rendered with
+plain Jinja2 for a few server sizes, then fed to the drop-in template.
+"""
+
+from pathlib import Path
+
+import pytest
+import yaml
+from jinja2 import Environment, FileSystemLoader
+
+ROLE = Path(__file__).parent.parent.parent / "roles" / "common"
+SIZING = ["conntrack_max", "conntrack_buckets", "netdev_max_backlog", "udp_buffer_max"]
+FORWARDING = [
+    {"item": "net.ipv4.ip_forward", "value": 1},
+    {"item": "net.ipv4.conf.all.forwarding", "value": 1},
+    {"item": "", "value": 1},
+]
+
+
+def _ansible_bool(value):
+    """Simulate the Ansible bool filter for test purposes."""
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() not in ("false", "no", "0", "")
+
+
+def size(memtotal_mb, vcpus):
+    """Evaluate the sizing defaults for a server with the given facts."""
+    defaults = yaml.safe_load((ROLE / "defaults" / "main.yml").read_text())
+    facts = {"ansible_memtotal_mb": memtotal_mb, "ansible_processor_vcpus": vcpus}
+    env = Environment()
+    for name in SIZING:
+        facts[name] = int(env.from_string(defaults[name]).render(**facts))
+    facts["udp_buffer_default"] = defaults["udp_buffer_default"]
+    return facts
+
+
+def render(tuning=True, spreading=False, **facts):
+    env = Environment(loader=FileSystemLoader(str(ROLE / "templates")), trim_blocks=True)
+    env.filters["bool"] = _ansible_bool
+    return env.get_template("99-algo-network.conf.j2").render(
+        sysctl=FORWARDING,
+        kernel_network_tuning=tuning,
+        network_cpu_spreading=spreading,
+        rps_interface="eth0",
+        rps_sock_flow_entries=32768,
+        **facts,
+    )
+
+
+@pytest.mark.parametrize(
+    "memtotal_mb,vcpus,conntrack_max,backlog,buffer",
+    [
+        (512, 1, 65536, 8192, 8388608),
+        (3900, 2, 249600, 8192, 16777216),
+        (16000, 8, 1024000, 32768, 16777216),
+        (262144, 64, 2097152, 65536, 16777216),
+    ],
+)
+def test_sizing(memtotal_mb, vcpus, conntrack_max, backlog, buffer):
+    """The conntrack table follows the memory and the backlog the CPU count, within bounds."""
+    facts = size(memtotal_mb, vcpus)
+
+    assert facts["conntrack_max"] == conntrack_max
+    assert facts["conntrack_buckets"] == conntrack_max // 4
+    assert facts["netdev_max_backlog"] == backlog
+    assert facts["udp_buffer_max"] == buffer
+
+
+def test_drop_in():
+    """The drop-in holds the forwarding settings followed by the tuning."""
+    result = render(**size(3900, 2))
+
+    lines = [line for line in result.splitlines() if line and not line.startswith("#")]
+    assert lines[:2] == ["net.ipv4.ip_forward = 1", "net.ipv4.conf.all.forwarding = 1"]
+    assert "net.netfilter.nf_conntrack_max = 249600" in lines
+    assert "net.netfilter.nf_conntrack_buckets = 62400" in lines
+    assert "net.core.rmem_max = 16777216" in lines
+    assert "net.core.default_qdisc = fq" in lines
+    assert "net.ipv4.tcp_congestion_control = bbr" in lines
+    assert all(" = " in line for line in lines)
+
+
+def test_drop_in_without_tuning():
+    """With the tuning disabled only the forwarding settings are written."""
+    result = render(tuning=False, **size(3900, 2))
+
+    lines = [line for line in result.splitlines() if line and not line.startswith("#")]
+    assert lines == ["net.ipv4.ip_forward = 1", "net.ipv4.conf.all.forwarding = 1"]
+
+
+def test_drop_in_rfs():
+    """The RFS flow table is sized with the CPU spreading, also without the tuning."""
+    result = render(tuning=False, spreading=True, **size(3900, 2))
+
+    assert "net.core.rps_sock_flow_entries = 32768" in result.splitlines()
+    assert "net.core.default_qdisc" not in result
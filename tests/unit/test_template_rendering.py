@@ -102,12 +102,12 @@ def test_critical_templates():
     """Test that critical templates render with test data"""
     critical_templates = [
         "roles/wireguard/templates/client.conf.j2",
-        "roles/strongswan/templates/ipsec.conf.j2",
-        "roles/strongswan/templates/ipsec.secrets.j2",
+        "roles/strongswan/templates/swanctl.conf.j2",
         "roles/dns/templates/adblock.sh.j2",
         "roles/dns/templates/dnsmasq.conf.j2",
         "roles/common/templates/rules.v4.j2",
         "roles/common/templates/rules.v6.j2",
+        "roles/common/templates/rules.nft.j2",
     ]
 
     test_vars = get_test_variables()
@@ -8,8 +8,13 @@ import os
 import re
 import sys
 import tempfile
+from pathlib import Path
 
+import pytest
 import yaml
+from jinja2 import Environment
+
+ROLES_DIR = Path(__file__).parent.parent.parent / "roles"
 
 
 def test_user_list_parsing():
@@ -176,6 +181,97 @@ users:
     print("✓ Duplicate user handling test passed")
 
 
+def _render_users_task(task_file, task_name, fact, variables):
+    """Evaluate a set_fact task that selects users to render, with minimal Ansible filters."""
+    with open(ROLES_DIR / task_file) as f:
+        tasks = yaml.safe_load(f)
+
+    def walk(items):
+        for task in items:
+            yield task
+            yield from walk(task.get("block", []))
+
+    task = next(t for t in walk(tasks) if t.get("name") == task_name)
+    env = Environment()
+    env.filters["bool"] = lambda x: str(x).lower() in ("true", "1", "yes")
+
+    def render(value, context):
+        if isinstance(value, list):
+            return [render(v, context) for v in value]
+        return yaml.safe_load(env.from_string(value.strip()).render(context))
+
+    local_vars = dict(variables)
+    for name, expr in task.get("vars", {}).items():
+        local_vars[name] = render(expr, local_vars)
+    return render(task["set_fact"][fact], local_vars)
+
+
+@pytest.mark.parametrize(
+    "task_file,task_name,fact,path_var,found_var,added_var,changed_var,client_files",
+    [
+        (
+            "wireguard/tasks/main.yml",
+            "Set the WireGuard users to render",
+            "wireguard_users_render",
+            "wireguard_config_path",
+            "_wireguard_client_configs",
+            "wireguard_users_added",
+            "wireguard_keys",
+            ["{}.conf", "{}.png", "apple/ios/{}.mobileconfig", "apple/macos/{}.mobileconfig"],
+        ),
+        (
+            "strongswan/tasks/client_configs.yml",
+            "Set the IPsec users to render",
+            "ipsec_users_render",
+            "ipsec_config_path",
+            "_ipsec_client_configs",
+            "ipsec_users_added",
+            "client_certs",
+            ["apple/{}.mobileconfig", "manual/{}.conf", "manual/{}.secrets"],
+        ),
+    ],
+)
+@pytest.mark.parametrize(
+    "incremental,keys_clean_all,expected",
+    [
+        (False, False, ["alice", "bob", "carol", "dave", "erin"]),
+        (True, False, ["carol", "dave", "bob", "erin"]),
+        (True, True, ["alice", "bob", "carol", "dave", "erin"]),
+    ],
+)
+def test_incremental_update_users_selection(
+    task_file,
+    task_name,
+    fact,
+    path_var,
+    found_var,
+    added_var,
+    changed_var,
+    client_files,
+    incremental,
+    keys_clean_all,
+    expected,
+):
+    """Incremental update-users only renders new users, changed credentials and missing client files"""
+    # alice, bob and erin have client files, but erin misses one; bob's credentials changed;
+    # carol is new; dave has no client files
+    found = [f"/cfg/{name.format(user)}" for user in ("alice", "bob", "erin", "removed") for name in client_files]
+    found.remove(f"/cfg/{client_files[-1].format('erin')}")
+    variables = {
+        "users": ["alice", "bob", "carol", "dave", "erin"],
+        "update_users_incremental": incremental,
+        "keys_clean_all": keys_clean_all,
+        path_var: "/cfg",
+        found_var: {"files": [{"path": path} for path in found]},
+        added_var: ["carol"],
+        changed_var: {"created": ["bob"], "issued": ["bob"]},
+    }
+
+    rendered = _render_users_task(task_file, task_name, fact, variables)
+
+    assert sorted(rendered) == sorted(expected)
+
+
 if __name__ == "__main__":
     tests = [
         test_user_list_parsing,
@@ -0,0 +1,144 @@
+"""Tests for the WireGuard address allocation module (library/wireguard_addresses.py)."""
+
+import json
+import stat
+
+import pytest
+import wireguard_addresses
+
+IPV4 = "10.49.0.0/16"
+IPV6 = "2001:db8:a160::/48"
+
+
+def _allocate(tmp_path, users, **kwargs):
+    kwargs.setdefault("network_ipv6", IPV6)
+    return wireguard_addresses.allocate_addresses(str(tmp_path / "addresses.json"), users, IPV4, **kwargs)
+
+
+def test_allocates_in_user_order(tmp_path):
+    """The server is host 1, users get consecutive addresses from host 2."""
+    result = _allocate(tmp_path, ["alice", "bob"])
+
+    assert result["changed"]
+    assert result["added"] == ["alice", "bob"]
+    assert result["addresses"] == {
+        "alice": {"ipv4": "10.49.0.2", "ipv6": "2001:db8:a160::2", "shard": 0},
+        "bob": {"ipv4": "10.49.0.3", "ipv6": "2001:db8:a160::3", "shard": 0},
+    }
+    assert result["shards"] == [{"ipv4": "10.49.0.1/16", "ipv6": "2001:db8:a160::1/48"}]
+    table = tmp_path / "addresses.json"
+    assert json.loads(table.read_text()) == {"hosts": {"alice": 2, "bob": 3}}
+    assert stat.S_IMODE(table.stat().st_mode) == 0o600
+
+
+def test_idempotent(tmp_path):
+    """A second run with the same users changes nothing."""
+    first = _allocate(tmp_path, ["alice", "bob"])
+    second = _allocate(tmp_path, ["alice", "bob"])
+
+    assert not second["changed"]
+    assert second["added"] == []
+    assert second["addresses"] == first["addresses"]
+
+
+def test_addresses_stable_across_removal(tmp_path):
+    """Removing a user keeps everybody's address and its own is reserved for it."""
+    first = _allocate(tmp_path, ["alice", "bob", "carol"])
+    removed = _allocate(tmp_path, ["alice", "carol", "dave"])
+
+    assert removed["added"] == ["dave"]
+    assert "bob" not in removed["addresses"]
+    assert removed["addresses"]["carol"] == first["addresses"]["carol"]
+    assert removed["addresses"]["dave"]["ipv4"] == "10.49.0.5"
+
+    readded = _allocate(tmp_path, ["bob", "alice"])
+    assert readded["addresses"]["bob"] == first["addresses"]["bob"]
+    # Peers are listed in allocation order, not in the order of users
+    assert list(readded["addresses"]) == ["alice", "bob"]
+
+
+def test_seeded_from_index(tmp_path):
+    """An existing index.txt keeps the addresses clients were configured with."""
+    index = tmp_path / "index.txt"
+    index.write_text("alice\nbob\ncarol\n")
+
+    result = _allocate(tmp_path, ["carol", "alice", "erin"], index_path=str(index))
+
+    assert result["changed"]
+    assert result["added"] == ["erin"]
+    assert result["addresses"]["alice"]["ipv4"] == "10.49.0.2"
+    assert result["addresses"]["carol"]["ipv4"] == "10.49.0.4"
+    assert result["addresses"]["erin"]["ipv4"] == "10.49.0.5"
+
+
+def test_ipv4_only(tmp_path):
+    """Without an IPv6 network only IPv4 addresses are returned."""
+    result = _allocate(tmp_path, ["alice"], network_ipv6=None)
+
+    assert result["addresses"] == {"alice": {"ipv4": "10.49.0.2", "shard": 0}}
+
+
+def test_check_mode(tmp_path):
+    """Check mode reports the allocation without writing the table."""
+    result = _allocate(tmp_path, ["alice"], check_mode=True)
+
+    assert result["changed"]
+    assert result["addresses"]["alice"]["ipv4"] == "10.49.0.2"
+    assert not (tmp_path / "addresses.json").exists()
+
+
+def test_network_exhausted(tmp_path):
+    """Running out of addresses is an error, not a wrap-around."""
+    with pytest.raises(ValueError, match="no room"):
+        wireguard_addresses.allocate_addresses(
+            str(tmp_path / "addresses.json"), ["a", "b", "c"], "10.49.0.0/30", check_mode=True
+        )
+
+
+def test_shards_balanced(tmp_path):
+    """Users are spread evenly over the shards, each shard in its own slice of the networks."""
+    result = _allocate(tmp_path, ["alice", "bob", "carol", "dave", "erin"], shards=3)
+
+    assert result["shards"] == [
+        {"ipv4": "10.49.0.1/18", "ipv6": "2001:db8:a160::1/50"},
+        {"ipv4": "10.49.64.1/18", "ipv6": "2001:db8:a160:4000::1/50"},
+        {"ipv4": "10.49.128.1/18", "ipv6": "2001:db8:a160:8000::1/50"},
+    ]
+    assert [address["shard"] for address in result["addresses"].values()] == [0, 0, 1, 1, 2]
+    assert result["addresses"]["bob"] == {"ipv4": "10.49.64.2", "ipv6": "2001:db8:a160:4000::2", "shard": 1}
+    assert result["addresses"]["dave"]["ipv4"] == "10.49.0.3"
+    table = json.loads((tmp_path / "addresses.json").read_text())
+    assert table["shards"] == 3
+
+
+def test_sharding_keeps_existing_peers(tmp_path):
+    """Existing peers stay on the first shard with their addresses, new users fill the others."""
+    first = _allocate(tmp_path, ["alice", "bob"])
+
+    result = _allocate(tmp_path, ["alice", "bob", "carol", "dave"], shards=2)
+
+    assert result["changed"]
+    assert result["added"] == ["carol", "dave"]
+    assert result["moved"] == []
+    assert result["addresses"]["alice"] == first["addresses"]["alice"]
+    assert result["addresses"]["bob"] == first["addresses"]["bob"]
+    assert [result["addresses"][u]["shard"] for u in ("carol", "dave")] == [1, 1]
+
+
+def test_fewer_shards_reallocates(tmp_path):
+    """Peers of a shard that no longer exists get new addresses, others report moved IPv6 addresses."""
+    _allocate(tmp_path, ["alice", "bob", "carol", "dave"], shards=4)
+
+    result = _allocate(tmp_path, ["alice", "bob", "carol", "dave"], shards=3)
+
+    assert result["added"] == ["dave"]
+    assert result["addresses"]["dave"]["shard"] == 0
+    assert result["moved"] == []
+
+    result = _allocate(tmp_path, ["alice", "bob", "carol", "dave"], shards=2)
+
+    # With halves of the network bob moves to the first shard, carol to the second
+    assert result["added"] == []
+    assert result["addresses"]["bob"]["shard"] == 0
+    assert result["addresses"]["carol"]["shard"] == 1
+    assert sorted(result["moved"]) == ["bob", "carol"]
@@ -0,0 +1,102 @@
+"""Tests for the batch WireGuard key generation module (library/wireguard_keys.py)."""
+
+import base64
+import stat
+
+import pytest
+import wireguard_keys
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import x25519
+
+USERS = ["alice", "bob", "10.0.0.1"]
+
+
+def _pubkey(raw):
+    key = x25519.X25519PrivateKey.from_private_bytes(raw).public_key()
+    return base64.b64encode(key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)).decode()
+
+
+def test_generates_all_key_files(tmp_path):
+    """Every user gets raw/base64 private and preshared keys plus a public key."""
+    result = wireguard_keys.generate_keys(str(tmp_path), USERS)
+
+    assert result["changed"]
+    assert result["created"] == USERS
+    for user in USERS:
+        for kind in ("private", "preshared"):
+            raw = (tmp_path / kind / f"{user}.raw").read_bytes()
+            assert len(raw) == 32
+            assert (tmp_path / kind / user).read_text() == base64.b64encode(raw).decode()
+            assert stat.S_IMODE((tmp_path / kind / user).stat().st_mode) == 0o600
+
+        priv_raw = (tmp_path / "private" / f"{user}.raw").read_bytes()
+        assert (tmp_path / "public" / user).read_text() == _pubkey(priv_raw)
+        assert result["public_keys"][user] == _pubkey(priv_raw)
+        assert stat.S_IMODE((tmp_path / "public" / user).stat().st_mode) == 0o644
+
+
+def test_idempotent(tmp_path):
+    """A second run with the same users changes nothing."""
+    first = wireguard_keys.generate_keys(str(tmp_path), USERS)
+    second = wireguard_keys.generate_keys(str(tmp_path), USERS)
+
+    assert not second["changed"]
+    assert second["created"] == []
+    assert second["public_keys"] == first["public_keys"]
+
+
+def test_only_new_users_created(tmp_path):
+    """Adding a user generates keys for that user only and keeps existing keys."""
+    first = wireguard_keys.generate_keys(str(tmp_path), ["alice"])
+    result = wireguard_keys.generate_keys(str(tmp_path), ["alice", "carol"])
+
+    assert result["changed"]
+    assert result["created"] == ["carol"]
+    assert result["public_keys"]["alice"] == first["public_keys"]["alice"]
+
+
+def test_rebuilds_derived_files(tmp_path):
+    """Missing base64 and public files are rebuilt from the existing raw key."""
+    wireguard_keys.generate_keys(str(tmp_path), ["alice"])
+    raw = (tmp_path / "private" / "alice.raw").read_bytes()
+    (tmp_path / "private" / "alice").unlink()
+    (tmp_path / "public" / "alice").unlink()
+
+    result = wireguard_keys.generate_keys(str(tmp_path), ["alice"])
+
+    assert result["changed"]
+    assert result["created"] == []
+    assert (tmp_path / "private" / "alice.raw").read_bytes() == raw
+    assert (tmp_path / "public" / "alice").read_text() == _pubkey(raw)
+
+
+def test_check_mode_writes_nothing(tmp_path):
+    """Check mode reports changes without touching the filesystem."""
+    result = wireguard_keys.generate_keys(str(tmp_path / "pki"), ["alice"], check_mode=True)
+
+    assert result["changed"]
+    assert not (tmp_path / "pki").exists()
+
+
+def test_run_module_rejects_path_traversal(tmp_path, mock_ansible_module, monkeypatch):
+    """User names that would escape the PKI directory are rejected."""
+    module = mock_ansible_module({"pki_path": str(tmp_path), "users": ["../evil"]})
+    module.check_mode = False
+    monkeypatch.setattr(wireguard_keys, "AnsibleModule", lambda **kwargs: module)
+
+    with pytest.raises(Exception, match="Invalid user names"):
+        wireguard_keys.run_module()
+    assert not any(tmp_path.iterdir())
+
+
+def test_run_module_returns_public_keys(tmp_path, mock_ansible_module, monkeypatch):
+    """The module returns public keys but never private key material."""
+    module = mock_ansible_module({"pki_path": str(tmp_path), "users": ["alice"]})
+    module.check_mode = False
+    monkeypatch.setattr(wireguard_keys, "AnsibleModule", lambda **kwargs: module)
+
+    wireguard_keys.run_module()
+
+    private_b64 = (tmp_path / "private" / "alice").read_text()
+    assert set(module.result["public_keys"]) == {"alice"}
+    assert private_b64 not in str(module.result)